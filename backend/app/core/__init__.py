@@ -1,9 +1,21 @@
-from .security import get_current_user, verify_token, create_access_token, verify_password, get_password_hash
+from .security import (
+    get_current_user,
+    verify_token,
+    create_access_token,
+    verify_password,
+    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
+    password_needs_rehash,
+)
 
 __all__ = [
     "get_current_user",
     "verify_token",
     "create_access_token", 
     "verify_password",
-    "get_password_hash"
+    "get_password_hash",
+    "verify_password_async",
+    "get_password_hash_async",
+    "password_needs_rehash"
 ]
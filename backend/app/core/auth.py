@@ -0,0 +1,86 @@
+"""
+Shared authentication dependencies for cookie-based JWT sessions
+"""
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import verify_token
+from app.models.models import User
+
+# user_id -> detached User snapshot; short TTL bounds staleness across replicas
+_user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+
+def _snapshot(user: User) -> User:
+    """Copy the loaded columns of `user` into a detached instance safe to share"""
+    columns = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+    snapshot = User(**columns)
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a cached user after it was updated or deleted"""
+    _user_cache.pop(int(user_id))
+
+async def get_current_user_id(request: Request) -> int:
+    """Get current user ID from JWT token"""
+    token = request.cookies.get("access_token")
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+
+    payload = verify_token(token)
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+
+    return int(user_id)
+
+async def require_admin(user_id: int = Depends(get_current_user_id)) -> int:
+    """Allow only users listed in ADMIN_USER_IDS"""
+    admin_ids = {int(value) for value in settings.admin_user_ids.split(",") if value.strip()}
+    if user_id not in admin_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user_id
+
+def _load_user(user_id: int, db: Session, missing_status: int) -> User:
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        # Attach a copy to this session without issuing a SELECT
+        return db.merge(cached, load=False)
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=missing_status,
+            detail="User not found"
+        )
+
+    _user_cache.set(user_id, _snapshot(user))
+    return user
+
+async def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+    """Get current user from JWT token, served from the user cache when possible"""
+    user_id = await get_current_user_id(request)
+    return _load_user(user_id, db, status.HTTP_401_UNAUTHORIZED)
+
+async def get_current_user_or_404(request: Request, db: Session = Depends(get_db)) -> User:
+    """Same as get_current_user, but a deleted account answers 404, as /auth/me and schedules always have"""
+    user_id = await get_current_user_id(request)
+    return _load_user(user_id, db, status.HTTP_404_NOT_FOUND)
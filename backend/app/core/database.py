@@ -1,22 +1,193 @@
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool, QueuePool
 from app.core.config import settings
+from app.core.metrics import (
+    instrument_engine, database_pool_limit, database_pool_wait_seconds, database_pool_timeouts_total,
+    database_read_sessions_total
+)
+from starlette.requests import HTTPConnection
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            database_pool_timeouts_total.inc()
+            raise
+        finally:
+            database_pool_wait_seconds.observe(time.perf_counter() - started)
+
+def pool_limits() -> tuple[int, int]:
+    """
+    (pool_size, max_overflow) for this worker.
+
+    With DB_CONNECTION_BUDGET set, the budget is split evenly over every
+    worker of every replica so the cluster as a whole stays under Postgres
+    max_connections; DB_POOL_SIZE then only caps the persistent part.
+    """
+    if settings.db_connection_budget <= 0:
+        return settings.db_pool_size, settings.db_max_overflow
+
+    per_worker = max(1, settings.db_connection_budget // (settings.db_replicas * settings.web_workers))
+    pool_size = min(settings.db_pool_size, per_worker)
+    return pool_size, per_worker - pool_size
+
+def engine_options() -> dict:
+    if settings.db_pgbouncer:
+        # PgBouncer owns the pool; psycopg2 sends no server-side prepared
+        # statements, so transaction pooling mode is safe
+        return {"poolclass": NullPool}
+
+    pool_size, max_overflow = pool_limits()
+    logger.info(f"Database pool: size={pool_size}, max_overflow={max_overflow}, recycle={settings.db_pool_recycle_seconds}s")
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        # Reuse the most recent connection so surplus ones idle out and get recycled
+        "pool_use_lifo": True,
+    }
 
 engine = create_engine(
     settings.database_url,
     echo=settings.debug,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    **engine_options(),
 )
 
+instrument_engine(engine)
+
+# Streaming replica for read-only endpoints; without one reads go to the primary
+read_engine = None
+if settings.read_database_url:
+    read_engine = create_engine(
+        settings.read_database_url,
+        echo=settings.debug,
+        **engine_options(),
+    )
+    instrument_engine(read_engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine or engine)
 
 Base = declarative_base()
 
+def pool_capacity() -> int:
+    """Connections this worker's pools may open (0 when PgBouncer pools for us)"""
+    if settings.db_pgbouncer:
+        return 0
+    pool_size, max_overflow = pool_limits()
+    return (pool_size + max_overflow) * (2 if read_engine is not None else 1)
+
+def report_pool_capacity() -> None:
+    # Called from the worker, not at import: with a preloaded app, values
+    # set in the gunicorn master are not carried into forked workers
+    database_pool_limit.set(pool_capacity())
+
+def dispose_engines_after_fork() -> None:
+    """Drop pooled connections inherited from the parent process without closing them"""
+    engine.dispose(close=False)
+    if read_engine is not None:
+        read_engine.dispose(close=False)
+
+def ping_database() -> None:
+    """Cheapest possible round trip to the primary; raises when it is unreachable"""
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
 async def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+# Read-your-writes: a client that just wrote reads from the primary until
+# the replica has caught up. The deadline travels in a cookie so it holds
+# whichever worker or replica serves the next request.
+PRIMARY_STICKY_COOKIE = "db_primary_until"
+
+# Per-request flag the session hooks set when a write is committed
+_request_wrote: ContextVar[Optional[list]] = ContextVar("request_wrote", default=None)
+
+@event.listens_for(SessionLocal, "after_flush")
+def _flag_flush(session, flush_context):
+    session.info["has_writes"] = True
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _flag_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _mark_request_wrote(session):
+    if session.info.pop("has_writes", False):
+        wrote = _request_wrote.get()
+        if wrote is not None:
+            wrote.append(True)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _clear_writes(session):
+    session.info.pop("has_writes", None)
+
+def _sticky_to_primary(connection: HTTPConnection) -> bool:
+    try:
+        return float(connection.cookies.get(PRIMARY_STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def get_read_db(connection: HTTPConnection):
+    """Session for read-only endpoints: the replica, or the primary right after this client wrote"""
+    if read_engine is None or _sticky_to_primary(connection):
+        database_read_sessions_total.labels(target="primary").inc()
+        db = SessionLocal()
+    else:
+        database_read_sessions_total.labels(target="replica").inc()
+        db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+class ReadAfterWriteMiddleware:
+    """Set the primary-sticky cookie on responses to requests that committed a write"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or read_engine is None:
+            await self.app(scope, receive, send)
+            return
+
+        # A list, not a bool: endpoints in the threadpool see the same object
+        wrote: list = []
+        token = _request_wrote.set(wrote)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and wrote:
+                until = time.time() + settings.read_after_write_seconds
+                cookie = (
+                    f"{PRIMARY_STICKY_COOKIE}={until:.3f}; Max-Age={settings.read_after_write_seconds}; "
+                    f"Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_wrote.reset(token)
@@ -1,11 +1,20 @@
 """
 Database initialization script with retry logic
+
+Runs once per deployment, before the API workers start:
+
+    python -m app.core.init_db
+
+It waits for the database and applies pending Alembic migrations
+(see app.core.migrations). Workers never touch the schema themselves;
+they only report readiness through /ready.
 """
 import asyncio
 import logging
 from sqlalchemy import text
 from app.core.config import settings
-from app.core.database import Base, engine
+from app.core.database import engine
+from app.core.migrations import upgrade_database
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +39,15 @@ async def wait_for_db(max_retries: int = 30, delay: int = 2):
 
 def init_db():
     """
-    Initialize database tables
+    Apply pending migrations
     """
     try:
-        logger.info("Creating database tables...")
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully!")
+        logger.info("Applying database migrations...")
+        upgrade_database()
+        logger.info("Database schema is up to date!")
         return True
     except Exception as e:
-        logger.error(f"Failed to create database tables: {e}")
+        logger.error(f"Failed to migrate database: {e}")
         return False
 
 async def initialize_database():
@@ -53,5 +62,6 @@ async def initialize_database():
 
 if __name__ == "__main__":
     import sys
+    logging.basicConfig(level=logging.INFO)
     success = asyncio.run(initialize_database())
     sys.exit(0 if success else 1)
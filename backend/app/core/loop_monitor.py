@@ -0,0 +1,100 @@
+"""
+Event loop lag monitor and blocking-call detector
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+from app.core.config import settings
+from app.core.metrics import event_loop_lag_seconds, event_loop_blocked_total, route_from_frame
+
+logger = logging.getLogger(__name__)
+
+class LoopMonitor:
+    """
+    Measures how late the event loop wakes up and reports what blocked it.
+
+    A probe task sleeps for `interval` and records the extra delay as
+    event-loop lag. A watchdog thread keeps posting a no-op callback to
+    the loop; when one is not run within `block_threshold`, it grabs the
+    loop thread's current stack - the code holding the loop - and logs it
+    with the active route. Stack captures are rate limited to one per
+    `log_interval` so a slow period does not flood the logs.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.loop_lag_interval_seconds,
+        block_threshold: float = settings.loop_block_threshold_ms / 1000,
+        log_interval: float = settings.loop_block_log_interval_seconds
+    ):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.log_interval = log_interval
+        self._loop_thread_id: Optional[int] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        if self._probe_task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._probe_task = loop.create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, args=(loop,), name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    async def _probe(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            event_loop_lag_seconds.observe(max(lag, 0.0))
+
+    def _watch(self, loop: asyncio.AbstractEventLoop) -> None:
+        last_logged = 0.0
+
+        while not self._stopped.wait(self.block_threshold / 2):
+            ran = threading.Event()
+            try:
+                loop.call_soon_threadsafe(ran.set)
+            except RuntimeError:
+                # Loop closed
+                return
+            if ran.wait(self.block_threshold):
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            route = route_from_frame(frame) or "<none>"
+            event_loop_blocked_total.labels(endpoint=route).inc()
+
+            now = time.perf_counter()
+            if frame is not None and now - last_logged >= self.log_interval:
+                last_logged = now
+                stack = "".join(traceback.format_stack(frame))
+                logger.warning(
+                    f"Event loop blocked for over {self.block_threshold * 1000:.0f}ms while handling {route}:\n{stack}"
+                )
+            del frame
+
+            # One report per stall: wait until the loop gets going again
+            while not ran.wait(0.5):
+                if self._stopped.is_set():
+                    return
+
+loop_monitor = LoopMonitor()
@@ -1,5 +1,13 @@
-from prometheus_client import Counter, Histogram, Gauge
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, generate_latest, multiprocess
+from sqlalchemy import event
+from starlette.routing import Match
+import logging
 import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
 
 # API метрики
 api_requests_total = Counter(
@@ -11,18 +19,22 @@ api_requests_total = Counter(
 api_request_duration_seconds = Histogram(
     'api_request_duration_seconds',
     'API request duration in seconds',
-    ['method', 'endpoint']
+    ['method', 'endpoint'],
+    # Most API calls finish well under a second; uploads can take much longer
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 15.0, 60.0)
 )
 
 # Стриминг метрики
 active_streams = Gauge(
     'active_streams_total',
-    'Total active streams'
+    'Total active streams',
+    multiprocess_mode='max'
 )
 
 total_viewers = Gauge(
     'total_viewers_gauge',
-    'Total viewers across all streams'
+    'Total viewers across all streams',
+    multiprocess_mode='max'
 )
 
 stream_views_total = Counter(
@@ -34,53 +46,342 @@ stream_views_total = Counter(
 # Система метрики
 database_connections = Gauge(
     'database_connections_gauge',
-    'Active database connections'
+    'Active database connections',
+    multiprocess_mode='livesum'
+)
+
+database_pool_limit = Gauge(
+    'database_pool_limit_gauge',
+    'Connections the pools may open (pool_size + max_overflow)',
+    multiprocess_mode='livesum'
+)
+
+database_read_sessions_total = Counter(
+    'database_read_sessions_total',
+    'Sessions opened for read-only endpoints, by the database that served them',
+    ['target']
+)
+
+database_pool_wait_seconds = Histogram(
+    'database_pool_wait_seconds',
+    'Time spent waiting to check a connection out of the pool',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+)
+
+database_pool_timeouts_total = Counter(
+    'database_pool_timeouts_total',
+    'Checkouts that gave up because the pool stayed exhausted'
 )
 
 redis_connections = Gauge(
     'redis_connections_gauge',
-    'Active Redis connections'
+    'Active Redis connections',
+    multiprocess_mode='livesum'
 )
 
 registered_users_total = Gauge(
     'registered_users_total',
-    'Total registered users'
+    'Total registered users',
+    multiprocess_mode='max'
 )
 
 active_channels = Gauge(
     'active_channels_gauge',
-    'Total active channels'
+    'Total active channels',
+    multiprocess_mode='max'
+)
+
+# Метрики базы данных по запросам
+db_queries_per_request = Histogram(
+    'db_queries_per_request',
+    'SQL statements executed while handling one request',
+    ['method', 'endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+)
+
+db_time_per_request_seconds = Histogram(
+    'db_time_per_request_seconds',
+    'Total time spent in SQL statements while handling one request',
+    ['method', 'endpoint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+# Event loop
+event_loop_lag_seconds = Histogram(
+    'event_loop_lag_seconds',
+    'Delay between a scheduled event loop wakeup and when it actually ran',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+event_loop_blocked_total = Counter(
+    'event_loop_blocked_total',
+    'Event loop stalls longer than the blocking threshold',
+    ['endpoint']
+)
+
+# Хеширование паролей
+password_hash_queue_seconds = Histogram(
+    'password_hash_queue_seconds',
+    'Time a password hash/verify job waited for a pool worker',
+    ['operation'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+password_hash_duration_seconds = Histogram(
+    'password_hash_duration_seconds',
+    'Time spent computing a password hash/verify',
+    ['operation'],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+)
+
+password_hash_rejected_total = Counter(
+    'password_hash_rejected_total',
+    'Password hash/verify jobs rejected because the pool queue was full',
+    ['operation']
+)
+
+# Чат
+chat_connections = Gauge(
+    'chat_connections_gauge',
+    'Open chat WebSocket connections',
+    multiprocess_mode='livesum'
+)
+
+chat_messages_total = Counter(
+    'chat_messages_total',
+    'Chat messages accepted for broadcast'
+)
+
+chat_deliveries_total = Counter(
+    'chat_deliveries_total',
+    'Chat messages sent to individual connections',
+    ['result']
+)
+
+chat_broadcast_seconds = Histogram(
+    'chat_broadcast_seconds',
+    'Time to fan one chat message out to every connection in its room',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+# Pub/sub (комментарии в реальном времени)
+pubsub_subscribers = Gauge(
+    'pubsub_subscribers_gauge',
+    'Open pub/sub subscriptions (WebSocket and SSE clients)',
+    multiprocess_mode='livesum'
+)
+
+pubsub_published_total = Counter(
+    'pubsub_published_total',
+    'Events published to the pub/sub backbone'
+)
+
+pubsub_deliveries_total = Counter(
+    'pubsub_deliveries_total',
+    'Events queued for individual subscribers',
+    ['result']
+)
+
+# Уведомления подписчиков
+notification_events_total = Counter(
+    'notification_events_total',
+    'Channel events fanned out to followers',
+    ['fanout']
+)
+
+notifications_written_total = Counter(
+    'notifications_written_total',
+    'Inbox entries written by the notification worker'
+)
+
+notification_fanout_delay_seconds = Histogram(
+    'notification_fanout_delay_seconds',
+    'Time from a channel event to the end of its fan-out',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+
+# Планировщик
+scheduler_leader = Gauge(
+    'scheduler_leader',
+    'Workers currently leading the scheduler (1 across the cluster when healthy)',
+    multiprocess_mode='livesum'
 )
 
+scheduler_jobs_total = Counter(
+    'scheduler_jobs_total',
+    'Scheduler jobs run',
+    ['job', 'result']
+)
+
+def generate_metrics() -> bytes:
+    """
+    Render metrics for a scrape.
+
+    Under gunicorn each worker writes samples to PROMETHEUS_MULTIPROC_DIR;
+    aggregating that directory gives totals for all workers instead of
+    whichever worker happened to receive the scrape.
+    """
+    if settings.prometheus_multiproc_dir:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+class QueryStats:
+    """SQL statements executed on behalf of one request"""
+
+    __slots__ = ("count", "total_seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total_seconds += duration
+        if duration > self.slowest_seconds:
+            self.slowest_seconds = duration
+            self.slowest_statement = statement
+
+# Set by PrometheusMiddleware for the duration of each HTTP request
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+def instrument_engine(engine) -> None:
+    """Attach query timing and connection pool hooks to a SQLAlchemy engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start_times"].pop()
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        database_connections.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        database_connections.dec()
+
+# Label values used instead of raw paths
+UNMATCHED_ENDPOINT = "<unmatched>"
+OVERFLOW_ENDPOINT = "<other>"
+
+def resolve_route_template(scope) -> str:
+    """Return the path template of the route that will handle `scope`"""
+    router = getattr(scope.get("app"), "router", None)
+    if router is None:
+        return UNMATCHED_ENDPOINT
+    
+    partial = None
+    for route in router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            # Path matched but the method did not (405)
+            partial = route.path
+    return partial or UNMATCHED_ENDPOINT
+
+def route_from_frame(frame) -> Optional[str]:
+    """
+    Endpoint label of the request whose code is executing in `frame`.
+
+    Used by samplers running in other threads, where the request's context
+    variables are not visible: walks up to the PrometheusMiddleware frame
+    and reads the label it computed.
+    """
+    while frame is not None:
+        if frame.f_code is PrometheusMiddleware.__call__.__code__:
+            return frame.f_locals.get("endpoint")
+        frame = frame.f_back
+    return None
+
 class PrometheusMiddleware:
-    def __init__(self, app):
+    """
+    Records request count and latency labeled by route template.
+
+    Labels come from the matched route (`/api/streams/{stream_id}`), never
+    from the raw path, so ids and stream keys do not create new series.
+    The number of distinct (method, endpoint) pairs is capped as well.
+    """
+
+    def __init__(self, app, max_label_sets: int = None):
         self.app = app
+        self.max_label_sets = max_label_sets or settings.metrics_max_label_sets
+        self._label_sets: set[tuple[str, str]] = set()
+
+    def _endpoint_label(self, method: str, endpoint: str) -> str:
+        key = (method, endpoint)
+        if key in self._label_sets:
+            return endpoint
+        if len(self._label_sets) >= self.max_label_sets:
+            return OVERFLOW_ENDPOINT
+        self._label_sets.add(key)
+        return endpoint
 
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
 
-        start_time = time.time()
+        start_time = time.perf_counter()
         method = scope["method"]
-        path = scope["path"]
+        endpoint = self._endpoint_label(method, resolve_route_template(scope))
+        query_stats = QueryStats()
+        stats_token = current_query_stats.set(query_stats)
 
         async def send_with_metrics(message):
             if message["type"] == "http.response.start":
                 status = message["status"]
-                duration = time.time() - start_time
+                duration = time.perf_counter() - start_time
                 
                 api_requests_total.labels(
                     method=method,
-                    endpoint=path,
+                    endpoint=endpoint,
                     status=status
                 ).inc()
                 
                 api_request_duration_seconds.labels(
                     method=method,
-                    endpoint=path
+                    endpoint=endpoint
                 ).observe(duration)
 
+                db_queries_per_request.labels(
+                    method=method,
+                    endpoint=endpoint
+                ).observe(query_stats.count)
+
+                db_time_per_request_seconds.labels(
+                    method=method,
+                    endpoint=endpoint
+                ).observe(query_stats.total_seconds)
+
+                if query_stats.slowest_seconds * 1000 >= settings.slow_query_log_ms:
+                    logger.warning(
+                        f"Slow query on {method} {endpoint}: {query_stats.slowest_seconds * 1000:.1f}ms "
+                        f"({query_stats.count} queries) {query_stats.slowest_statement}"
+                    )
+
+                if settings.debug:
+                    server_timing = (
+                        f'db;dur={query_stats.total_seconds * 1000:.2f};desc="{query_stats.count} queries", '
+                        f'app;dur={duration * 1000:.2f}'
+                    )
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", server_timing.encode())
+                    ]
+
             await send(message)
 
-        await self.app(scope, receive, send_with_metrics)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            current_query_stats.reset(stats_token)
@@ -0,0 +1,155 @@
+"""
+Schema migrations (Alembic, backend/migrations) and helpers for writing them
+
+Revisions must be safe to run against a live database:
+
+- indexes on big tables are built with create_index_concurrently, which
+  does not block writes;
+- data changes go through backfill_in_batches, which commits every batch
+  so no long transaction holds row locks or bloats the table;
+- constraints on big tables are added NOT VALID and checked with
+  validate_constraint once the ALTER TABLE that added them has committed;
+- env.py sets lock_timeout, so DDL that cannot get its lock quickly fails
+  and can be retried, instead of queueing every query behind it.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+from alembic import command, op
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from app.core.config import settings
+from app.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Schema as create_all built it before migrations were tracked
+BASELINE_REVISION = "0001"
+
+def alembic_config() -> Config:
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    # Keep the caller's logging setup instead of the one in alembic.ini
+    config.attributes["configure_logger"] = False
+    return config
+
+def upgrade_database() -> None:
+    """
+    Apply pending migrations.
+
+    A database created before migrations existed has the tables but no
+    alembic_version; it is stamped at the baseline first, so only the
+    later revisions run against it.
+    """
+    config = alembic_config()
+    tables = set(inspect(engine).get_table_names())
+    if "alembic_version" not in tables and "users" in tables:
+        logger.info(f"Existing schema without version table, stamping baseline {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    **kw,
+) -> None:
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS on Postgres; a plain CREATE INDEX elsewhere.
+
+    CONCURRENTLY cannot run inside a transaction, so the statement runs in
+    an autocommit block. A failed concurrent build leaves an INVALID index
+    behind that IF NOT EXISTS would keep; it is dropped first so a rerun
+    builds it again.
+    """
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True, **kw)
+        return
+
+    context = op.get_context()
+    with context.autocommit_block():
+        # Offline (--sql) there is no database to inspect
+        invalid = not context.as_sql and bind.execute(
+            text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ),
+            {"name": name},
+        ).first()
+        if invalid:
+            logger.warning(f"Dropping invalid index {name} left by an interrupted build")
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(
+            name, table, columns, unique=unique, if_not_exists=True, postgresql_concurrently=True, **kw
+        )
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.drop_index(name, table_name=table, if_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+def validate_constraint(table: str, name: str) -> None:
+    """
+    ALTER TABLE ... VALIDATE CONSTRAINT on Postgres, in a transaction of its own.
+
+    VALIDATE takes a lock that lets reads and writes through while it
+    scans the table, but inside the revision's transaction the ACCESS
+    EXCLUSIVE lock of the preceding ALTER TABLE would still be held for
+    the whole scan. The autocommit block commits that transaction first.
+    """
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+def backfill_in_batches(
+    table: str,
+    set_clause: str,
+    where_clause: str = "TRUE",
+    batch_size: Optional[int] = None,
+    pause_seconds: float = 0.0,
+) -> int:
+    """
+    UPDATE table SET set_clause WHERE where_clause, one primary-key range at a time.
+
+    Every batch commits on its own, so row locks are held for one batch
+    only and an interrupted backfill resumes where it stopped when
+    where_clause excludes rows that are already done. Returns the number
+    of updated rows.
+    """
+    if op.get_context().as_sql:
+        op.execute(f"UPDATE {table} SET {set_clause} WHERE {where_clause}")
+        return 0
+
+    batch_size = batch_size or settings.migration_batch_size
+    bind = op.get_bind()
+    updated = 0
+
+    with op.get_context().autocommit_block():
+        low, high = bind.execute(text(f"SELECT MIN(id), MAX(id) FROM {table}")).one()
+        if low is None:
+            return 0
+
+        statement = text(
+            f"UPDATE {table} SET {set_clause} "
+            f"WHERE id >= :start AND id < :stop AND ({where_clause})"
+        )
+        for start in range(low, high + 1, batch_size):
+            result = bind.execute(statement, {"start": start, "stop": start + batch_size})
+            updated += result.rowcount
+            if pause_seconds:
+                # Let replicas and autovacuum keep up on big tables
+                time.sleep(pause_seconds)
+
+    logger.info(f"Backfilled {updated} rows in {table}")
+    return updated
@@ -0,0 +1,91 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+# Clients read the next page token from this header; list bodies stay unchanged
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Largest page a listing serves
+MAX_PAGE_LIMIT = 100
+
+def check_limit(limit: int, maximum: int = MAX_PAGE_LIMIT) -> None:
+    """Reject a page size outside 1..maximum with 400"""
+    if not 1 <= limit <= maximum:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {maximum}"
+        )
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode (created_at, id) of the last row into an opaque token"""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a token produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def encode_rank_cursor(score: float, row_id: int) -> str:
+    """Encode (score, id) of the last row of a ranked listing, such as search results"""
+    raw = json.dumps([score, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_rank_cursor(cursor: str) -> tuple[float, int]:
+    """Decode a token produced by encode_rank_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(score), int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def paginate(
+    query,
+    model,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20
+) -> list:
+    """
+    Return one newest-first page of `query` ordered by (created_at, id).
+
+    With a cursor the page starts right after the encoded row, which lets
+    Postgres seek on the (…, created_at, id) index instead of scanning
+    `skip` rows. `skip` is still honoured when no cursor is given.
+    """
+    check_limit(limit)
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    elif skip:
+        query = query.offset(skip)
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+
+    return rows
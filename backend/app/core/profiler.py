@@ -0,0 +1,96 @@
+"""
+Low-overhead statistical profiler for a running worker
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from app.core.metrics import route_from_frame
+
+NO_ROUTE = "<no route>"
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(os.getcwd()):
+        filename = os.path.relpath(filename)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads every `interval` seconds.
+
+    Stacks are stored root-first and prefixed with the route template of
+    the request being handled (found via PrometheusMiddleware's frame), so
+    the output groups time per endpoint. Only one profile runs at a time.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+
+    def run(self, seconds: float) -> "SamplingProfiler":
+        own_thread = threading.get_ident()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        started = time.perf_counter()
+        deadline = started + seconds
+
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                route = route_from_frame(frame) or NO_ROUTE
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                stack.append(route)
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+        self.duration = time.perf_counter() - started
+        return self
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, one `a;b;c count` line per stack"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def speedscope(self, name: str = "xatube-backend") -> dict:
+        """Sampled profile in speedscope's file format"""
+        frames: list[dict] = []
+        frame_index: dict[str, int] = {}
+        samples = []
+        weights = []
+
+        for stack, count in self.stacks.items():
+            indices = []
+            for label in stack:
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    frames.append({"name": label})
+                indices.append(frame_index[label])
+            samples.append(indices)
+            weights.append(count * self.interval)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": name,
+            "exporter": "xatube-backend",
+        }
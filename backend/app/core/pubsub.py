@@ -0,0 +1,195 @@
+"""
+Pub/sub backbone for real-time events
+
+Publishers call `await pubsub.publish(topic, event)`; every open
+subscription to the topic receives the event through its own bounded
+queue, so a client that stops reading never slows the publisher - once
+its queue is full it misses events (counted in pubsub_deliveries_total).
+
+- InMemoryPubSub delivers within the worker process only.
+- RedisPubSub relays events through Redis PUBLISH/SUBSCRIBE, so
+  subscribers on any worker of any replica receive them. Each worker
+  keeps one Redis subscription per topic that has local subscribers and
+  fans events out in-process.
+
+Delivery is best effort: events are not stored, and a client that
+reconnects should reload the current state over the REST API.
+"""
+import asyncio
+import json
+import logging
+from typing import Optional
+from app.core.config import settings
+from app.core.metrics import pubsub_subscribers, pubsub_published_total, pubsub_deliveries_total
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """One subscriber's view of a topic; close it when the client goes away"""
+
+    def __init__(self, broker: "InMemoryPubSub", topic: str, queue_size: int):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._broker = broker
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        # Synchronous, so it also runs from a cancelled request
+        self._broker._unsubscribe(self)
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+class InMemoryPubSub:
+    def __init__(self, queue_size: int = settings.pubsub_queue_size):
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[Subscription]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, topic: str, event: dict) -> None:
+        pubsub_published_total.inc()
+        self._deliver(topic, event)
+
+    async def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(self, topic, self.queue_size)
+        self._subscribers.setdefault(topic, set()).add(subscription)
+        pubsub_subscribers.inc()
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.topic)
+        if not subscribers or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        pubsub_subscribers.dec()
+        if not subscribers:
+            del self._subscribers[subscription.topic]
+
+    def _deliver(self, topic: str, event: dict) -> None:
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return
+
+        dropped = 0
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                dropped += 1
+
+        pubsub_deliveries_total.labels(result="ok").inc(len(subscribers) - dropped)
+        if dropped:
+            pubsub_deliveries_total.labels(result="dropped").inc(dropped)
+
+class RedisPubSub(InMemoryPubSub):
+    CHANNEL_PREFIX = "xatube:"
+
+    def __init__(self, url: str, queue_size: int = settings.pubsub_queue_size):
+        super().__init__(queue_size)
+        self.url = url
+        self._redis = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        # Topics this worker is subscribed to in Redis
+        self._channels: set[str] = set()
+        self._sync_lock = asyncio.Lock()
+        self._pending: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        # Optional dependency, only needed with PUBSUB_BACKEND=redis
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(self.url, decode_responses=True)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._reader = asyncio.create_task(self._read())
+        logger.info("Pub/sub: relaying events through Redis")
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        if self._redis is not None:
+            await self._redis.close()
+
+    async def publish(self, topic: str, event: dict) -> None:
+        pubsub_published_total.inc()
+        try:
+            await self._redis.publish(self.CHANNEL_PREFIX + topic, json.dumps(event))
+        except Exception as e:
+            # The change itself is committed; only the live update is lost
+            logger.warning(f"Failed to publish event to {topic}: {e}")
+
+    async def subscribe(self, topic: str) -> Subscription:
+        subscription = await super().subscribe(topic)
+        try:
+            # Awaited, so no event published after this returns is missed
+            await self._sync_channels()
+        except Exception:
+            subscription.close()
+            raise
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        super()._unsubscribe(subscription)
+        if subscription.topic not in self._subscribers:
+            task = asyncio.get_running_loop().create_task(self._sync_channels())
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _sync_channels(self) -> None:
+        """Match Redis subscriptions to the topics that have local subscribers"""
+        async with self._sync_lock:
+            wanted = set(self._subscribers)
+            added, removed = wanted - self._channels, self._channels - wanted
+            if added:
+                await self._pubsub.subscribe(*(self.CHANNEL_PREFIX + topic for topic in added))
+                self._channels |= added
+            if removed:
+                await self._pubsub.unsubscribe(*(self.CHANNEL_PREFIX + topic for topic in removed))
+                self._channels -= removed
+
+    async def _read(self) -> None:
+        while True:
+            if not self._channels:
+                await asyncio.sleep(0.5)
+                continue
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # redis-py reconnects and resubscribes on the next read
+                logger.warning(f"Pub/sub read failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            try:
+                event = json.loads(message["data"])
+            except (TypeError, ValueError):
+                logger.warning(f"Dropping malformed pub/sub message on {message.get('channel')}")
+                continue
+            self._deliver(message["channel"][len(self.CHANNEL_PREFIX):], event)
+
+def create_pubsub() -> InMemoryPubSub:
+    if settings.pubsub_backend == "redis":
+        return RedisPubSub(settings.redis_url)
+    return InMemoryPubSub()
+
+pubsub = create_pubsub()
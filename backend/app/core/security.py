@@ -4,25 +4,81 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import hashlib
+import hmac
+import time
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.metrics import password_hash_queue_seconds, password_hash_duration_seconds, password_hash_rejected_total
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+# bcrypt releases the GIL, so a thread pool sized to the cores scales with them
+_hash_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.password_hash_workers),
+    thread_name_prefix="password-hash"
+)
+_pending_hash_jobs = 0
+
+def _is_bcrypt_hash(hashed_password: str) -> bool:
+    return hashed_password.startswith('$2b$') or hashed_password.startswith('$2a$')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    # Temporary: check if it's a bcrypt hash
-    if hashed_password.startswith('$2b$') or hashed_password.startswith('$2a$'):
+    if _is_bcrypt_hash(hashed_password):
         try:
             return pwd_context.verify(plain_password, hashed_password)
-        except:
+        except (ValueError, TypeError):
             return False
-    # Temporary: fallback to SHA256 for testing
-    else:
-        return hashlib.sha256(plain_password.encode()).hexdigest() == hashed_password
+    # Legacy unsalted SHA-256 hashes, rehashed on the next successful login
+    legacy_hash = hashlib.sha256(plain_password.encode()).hexdigest()
+    return hmac.compare_digest(legacy_hash, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    # Temporary: use SHA256 for testing instead of bcrypt
-    return hashlib.sha256(password.encode()).hexdigest()
+    return pwd_context.hash(password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True for legacy SHA-256 hashes and bcrypt hashes with an outdated cost"""
+    if not _is_bcrypt_hash(hashed_password):
+        return True
+    return pwd_context.needs_update(hashed_password)
+
+async def _run_hash_job(operation: str, func, *args):
+    """Run a hashing call on the bounded pool, shedding load when it is saturated"""
+    global _pending_hash_jobs
+    
+    if _pending_hash_jobs >= settings.password_hash_max_pending:
+        password_hash_rejected_total.labels(operation=operation).inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry",
+            headers={"Retry-After": "1"}
+        )
+    
+    queued_at = time.perf_counter()
+    
+    def job():
+        started_at = time.perf_counter()
+        password_hash_queue_seconds.labels(operation=operation).observe(started_at - queued_at)
+        try:
+            return func(*args)
+        finally:
+            password_hash_duration_seconds.labels(operation=operation).observe(time.perf_counter() - started_at)
+    
+    _pending_hash_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, job)
+    finally:
+        _pending_hash_jobs -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password without blocking the event loop"""
+    return await _run_hash_job("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash without blocking the event loop"""
+    return await _run_hash_job("hash", get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -34,12 +90,24 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
+# Verified token -> claims, so repeat requests skip the signature check
+_token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=settings.token_cache_ttl_seconds)
+
 def verify_token(token: str) -> Optional[dict]:
+    payload = _token_cache.get(token)
+    if payload is not None:
+        # Cached entries never outlive the token's own expiry
+        return dict(payload)
+    
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
     except JWTError:
         return None
+    
+    exp = payload.get("exp")
+    if exp is not None:
+        _token_cache.set(token, payload, ttl=exp - time.time())
+    return dict(payload)
 
 security = HTTPBearer(auto_error=False)
 
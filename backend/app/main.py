@@ -4,47 +4,26 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.openapi.utils import get_openapi
 from fastapi.staticfiles import StaticFiles
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import CONTENT_TYPE_LATEST
 from starlette.responses import Response
 import logging
 import asyncio
 from app.core.config import settings
-from app.core.database import Base, engine
-from app.core.metrics import PrometheusMiddleware
+from app.core.database import ReadAfterWriteMiddleware, ping_database, report_pool_capacity
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import PrometheusMiddleware, generate_metrics
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.pubsub import pubsub
 from app.models.models import User, Channel, Stream, StreamView, Statistic, Document
-from app.routes import auth, channels, streams, statistics, documents, users, rtmp, chat, subscriptions, schedules, comments
+from app.routes import auth, channels, streams, statistics, documents, users, rtmp, chat, subscriptions, schedules, comments, notifications, search, admin
+from app.services.notifications import notification_worker
+from app.services.scheduler import scheduler
+from app.services.trending import trending_board
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize database tables with retry logic
-def init_db_tables():
-    """Initialize database tables with retry logic"""
-    max_retries = 30
-    delay = 2
-    
-    for attempt in range(max_retries):
-        try:
-            logger.info(f"Attempting to create database tables (attempt {attempt + 1}/{max_retries})...")
-            Base.metadata.create_all(bind=engine)
-            logger.info("Database tables created successfully!")
-            return True
-        except Exception as e:
-            logger.warning(f"Failed to create tables (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                import time
-                time.sleep(delay)
-            else:
-                logger.error("Failed to initialize database after all retries")
-                raise
-
-# Try to initialize tables at startup
-try:
-    init_db_tables()
-except Exception as e:
-    logger.error(f"Critical error during database initialization: {e}")
-
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.api_title,
@@ -63,6 +42,7 @@ app.add_middleware(
     allow_credentials=settings.cors_credentials,
     allow_methods=settings.cors_methods,
     allow_headers=settings.cors_headers,
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Trusted host middleware
@@ -71,6 +51,9 @@ app.add_middleware(
     allowed_hosts=["*"],  # In production, specify exact hosts
 )
 
+# Keeps a client's reads on the primary right after it writes
+app.add_middleware(ReadAfterWriteMiddleware)
+
 # Prometheus middleware
 app.add_middleware(PrometheusMiddleware)
 
@@ -84,8 +67,11 @@ app.include_router(users.router)
 app.include_router(subscriptions.router)
 app.include_router(schedules.router)
 app.include_router(comments.router)
+app.include_router(notifications.router)
+app.include_router(search.router)
 app.include_router(rtmp.router)
 app.include_router(chat.router)
+app.include_router(admin.router)
 
 # Health check endpoint
 @app.get("/health")
@@ -96,12 +82,26 @@ async def health_check():
         content={"status": "healthy", "service": "StreamHub Backend"}
     )
 
+# Readiness endpoint
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: the worker can reach the database (schema is managed by app.core.init_db)"""
+    try:
+        await asyncio.wait_for(asyncio.to_thread(ping_database), timeout=settings.readiness_timeout_seconds)
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {e}")
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "database": "unreachable"}
+        )
+    return {"status": "ready"}
+
 # Metrics endpoint
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
     return Response(
-        content=generate_latest(),
+        content=generate_metrics(),
         media_type=CONTENT_TYPE_LATEST
     )
 
@@ -168,11 +168,26 @@ async def startup_event():
     logger.info(f"Database: {settings.database_url}")
     logger.info(f"Redis: {settings.redis_url}")
     logger.info(f"Uploads directory mounted at /uploads")
+    report_pool_capacity()
+    await pubsub.start()
+    # Every worker serves the ranking; only the scheduler leader computes it
+    trending_board.start()
+    if settings.notifications_worker_enabled:
+        notification_worker.start()
+    if settings.scheduler_enabled:
+        scheduler.start()
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("XaTube Backend shutting down...")
+    await loop_monitor.stop()
+    await scheduler.stop()
+    await notification_worker.stop()
+    await trending_board.stop()
+    await pubsub.stop()
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,8 +1,21 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Float, Index, func, literal_column, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
 
+def search_document(*columns):
+    """
+    tsvector of the given text columns, as indexed for /api/search (Postgres only).
+
+    Queries must build it with this same function so the planner matches
+    the GIN index. The 'simple' configuration does no stemming, which
+    suits titles in any language.
+    """
+    document = func.coalesce(columns[0], literal_column("''"))
+    for column in columns[1:]:
+        document = document.op("||")(literal_column("' '")).op("||")(func.coalesce(column, literal_column("''")))
+    return func.to_tsvector(literal_column("'simple'::regconfig"), document)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -23,6 +36,15 @@ class User(Base):
     subscriptions = relationship("Subscription", back_populates="subscriber", cascade="all, delete-orphan")
     comments = relationship("Comment", back_populates="user", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # /api/search and the prefix match of /api/search/suggest
+        Index("ix_users_search", search_document(username, full_name), postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index(
+            "ix_users_username_prefix", func.lower(username).label("username_lower"),
+            postgresql_ops={"username_lower": "text_pattern_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
 class Channel(Base):
     __tablename__ = "channels"
 
@@ -42,6 +64,18 @@ class Channel(Base):
     streams = relationship("Stream", back_populates="channel", cascade="all, delete-orphan")
     statistics = relationship("Statistic", back_populates="channel", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of the channel listing
+        Index("ix_channels_created_at_id", "created_at", "id"),
+        Index("ix_channels_user_id", "user_id"),
+        # /api/search and the prefix match of /api/search/suggest
+        Index("ix_channels_search", search_document(title, description), postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index(
+            "ix_channels_title_prefix", func.lower(title).label("title_lower"),
+            postgresql_ops={"title_lower": "text_pattern_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
 class Stream(Base):
     __tablename__ = "streams"
 
@@ -58,6 +92,8 @@ class Stream(Base):
     is_live = Column(Boolean, default=False, index=True)
     is_archived = Column(Boolean, default=False)
     view_count = Column(Integer, default=0)
+    # Comments and replies, kept up to date by the comment routes
+    comment_count = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -66,6 +102,17 @@ class Stream(Base):
     views = relationship("StreamView", back_populates="stream", cascade="all, delete-orphan")
     comments = relationship("Comment", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination: public live listing and per-channel listings
+        Index("ix_streams_is_live_created_at_id", "is_live", "created_at", "id"),
+        Index("ix_streams_channel_id_created_at_id", "channel_id", "created_at", "id"),
+        # Channel page filters: current live stream and archived videos
+        Index("ix_streams_channel_id_is_live_created_at", "channel_id", "is_live", "created_at"),
+        Index("ix_streams_channel_id_is_archived_created_at", "channel_id", "is_archived", "created_at"),
+        # /api/search
+        Index("ix_streams_search", search_document(title, description), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
 class StreamView(Base):
     __tablename__ = "stream_views"
 
@@ -81,6 +128,12 @@ class StreamView(Base):
     stream = relationship("Stream", back_populates="views")
     user = relationship("User", back_populates="stream_views")
 
+    __table_args__ = (
+        Index("ix_stream_views_stream_id", "stream_id"),
+        # Trending: views per stream in a time range (index-only)
+        Index("ix_stream_views_started_at_stream_id", "started_at", "stream_id"),
+    )
+
 class Statistic(Base):
     __tablename__ = "statistics"
 
@@ -94,10 +147,10 @@ class Statistic(Base):
     # Relationships
     channel = relationship("Channel", back_populates="statistics")
 
-    class Config:
-        __table_args__ = (
-            {'schema': None},  # Здесь можно добавить уникальные ограничения
-        )
+    __table_args__ = (
+        # One rollup per channel per day
+        Index("uq_statistics_channel_id_date", "channel_id", "date", unique=True),
+    )
 
 class Document(Base):
     __tablename__ = "documents"
@@ -123,6 +176,14 @@ class Subscription(Base):
     subscriber = relationship("User", back_populates="subscriptions")
     channel = relationship("Channel")
 
+    __table_args__ = (
+        Index("uq_subscriptions_subscriber_id_channel_id", "subscriber_id", "channel_id", unique=True),
+        # Subscriber counts per channel; id order pages followers for notification fan-out
+        Index("ix_subscriptions_channel_id_id", "channel_id", "id"),
+        # Keyset pagination of a user's subscription feed
+        Index("ix_subscriptions_subscriber_id_created_at_id", "subscriber_id", "created_at", "id"),
+    )
+
 class Schedule(Base):
     __tablename__ = "schedules"
 
@@ -131,18 +192,33 @@ class Schedule(Base):
     title = Column(String(100), nullable=False)
     description = Column(Text)
     scheduled_at = Column(DateTime, nullable=False)
+    # Set when the scheduler sent the reminder; cleared when scheduled_at moves
+    notified_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     channel = relationship("Channel")
 
+    __table_args__ = (
+        Index("ix_schedules_channel_id_scheduled_at", "channel_id", "scheduled_at"),
+        # Reminders the scheduler still has to send
+        Index(
+            "ix_schedules_pending_scheduled_at", "scheduled_at",
+            postgresql_where=text("notified_at IS NULL"),
+            sqlite_where=text("notified_at IS NULL"),
+        ),
+    )
+
 class Comment(Base):
     __tablename__ = "comments"
 
     id = Column(Integer, primary_key=True, index=True)
     stream_id = Column(Integer, ForeignKey("streams.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Top-level comment this one replies to; threads are one level deep
+    parent_id = Column(Integer, ForeignKey("comments.id", ondelete="CASCADE"), nullable=True)
+    reply_count = Column(Integer, default=0, server_default="0", nullable=False)
     text = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -150,3 +226,57 @@ class Comment(Base):
     # Relationships
     stream = relationship("Stream")
     user = relationship("User", back_populates="comments")
+
+    __table_args__ = (
+        # Keyset pagination of a video's comments
+        Index("ix_comments_stream_id_created_at_id", "stream_id", "created_at", "id"),
+        # Keyset pagination of a thread's replies
+        Index("ix_comments_parent_id_created_at_id", "parent_id", "created_at", "id"),
+    )
+
+class ChannelEvent(Base):
+    """Something a channel's followers are told about; the notification worker fans it out"""
+    __tablename__ = "channel_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    channel_id = Column(Integer, ForeignKey("channels.id", ondelete="CASCADE"), nullable=False)
+    stream_id = Column(Integer, ForeignKey("streams.id", ondelete="SET NULL"), nullable=True)
+    schedule_id = Column(Integer, ForeignKey("schedules.id", ondelete="SET NULL"), nullable=True)
+    event_type = Column(String(32), nullable=False)
+    title = Column(String(255))
+    # "push": inbox rows written per follower; "pull": merged into inboxes at read time
+    fanout = Column(String(8))
+    # Last subscriptions.id already fanned out, so an interrupted fan-out resumes
+    fanout_cursor = Column(Integer, default=0, server_default="0", nullable=False)
+    fanned_out_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    channel = relationship("Channel")
+
+    __table_args__ = (
+        # Pull-mode events of followed channels, newest first
+        Index("ix_channel_events_channel_id_created_at_id", "channel_id", "created_at", "id"),
+        # Events the worker has not finished
+        Index(
+            "ix_channel_events_pending", "id",
+            postgresql_where=text("fanned_out_at IS NULL"),
+            sqlite_where=text("fanned_out_at IS NULL"),
+        ),
+    )
+
+class Notification(Base):
+    """One follower's inbox entry for a push-mode channel event"""
+    __tablename__ = "notifications"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    event_id = Column(Integer, ForeignKey("channel_events.id", ondelete="CASCADE"), nullable=False)
+    # Copied from the event so the inbox pages on one index
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_notifications_user_id_created_at_event_id", "user_id", "created_at", "event_id"),
+        # One entry per follower and event; also serves the cascade from channel_events
+        Index("uq_notifications_event_id_user_id", "event_id", "user_id", unique=True),
+    )
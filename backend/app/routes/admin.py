@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.core.auth import require_admin
+from app.core.config import settings
+from app.core.profiler import SamplingProfiler
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+# One profile per worker at a time
+_profile_lock = asyncio.Lock()
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = 10,
+    interval_ms: float = 10,
+    format: str = "collapsed",
+    admin_id: int = Depends(require_admin)
+):
+    """Profile this worker for N seconds and return collapsed stacks or a speedscope file"""
+    
+    if not settings.profiler_enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profiler is disabled"
+        )
+    
+    if format not in ("collapsed", "speedscope"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format must be 'collapsed' or 'speedscope'"
+        )
+    
+    if not 0 < seconds <= settings.profiler_max_seconds or not 1 <= interval_ms <= 1000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds must be in (0, {settings.profiler_max_seconds}], interval_ms in [1, 1000]"
+        )
+    
+    if _profile_lock.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running on this worker"
+        )
+    
+    async with _profile_lock:
+        logger.info(f"Profiling worker {os.getpid()} for {seconds}s (requested by user {admin_id})")
+        # Sample from a separate thread so the event loop keeps serving traffic
+        profiler = SamplingProfiler(interval=interval_ms / 1000)
+        await asyncio.to_thread(profiler.run, seconds)
+    
+    headers = {"X-Profile-Pid": str(os.getpid()), "X-Profile-Samples": str(profiler.samples)}
+    if format == "speedscope":
+        return JSONResponse(
+            content=profiler.speedscope(name=f"worker {os.getpid()}"),
+            headers={**headers, "Content-Disposition": f'attachment; filename="profile-{os.getpid()}.speedscope.json"'}
+        )
+    return PlainTextResponse(profiler.collapsed(), headers=headers)
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from app.core.database import get_db
-from app.core.security import get_password_hash, verify_password, create_access_token, verify_token
+from app.core.auth import get_current_user_or_404, invalidate_user
+from app.core.security import get_password_hash_async, verify_password_async, password_needs_rehash, create_access_token
 from app.models.models import User, Channel
 from app.schemas.schemas import UserCreate, UserResponse, Token, TokenData
 import logging
@@ -32,7 +33,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -65,13 +66,20 @@ async def login(username: str, password: str, response: Response, db: Session =
     
     user = db.query(User).filter(User.username == username).first()
     
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade legacy SHA-256 (or outdated-cost) hashes while we have the plain password
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await get_password_hash_async(password)
+        db.commit()
+        invalidate_user(user.id)
+        logger.info(f"Password hash upgraded for user: {username}")
+    
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -103,40 +111,9 @@ async def logout(response: Response):
     return {"message": "Successfully logged out"}
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(request: Request, db: Session = Depends(get_db)):
+async def get_me(user: User = Depends(get_current_user_or_404)):
     """Get current authenticated user"""
     
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    payload = verify_token(token)
-    
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user_id = payload.get("sub")
-    
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     logger.info(f"GET /auth/me for user {user.id}")
     logger.info(f"User: id={user.id}, username={user.username}, avatar_url={user.avatar_url}")
     logger.info(f"Returning user object, FastAPI will serialize with UserResponse schema")
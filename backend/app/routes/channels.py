@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 import secrets
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.pagination import paginate
 from app.models.models import Channel, User, Stream
 from app.schemas.schemas import ChannelCreate, ChannelResponse, ChannelUpdate
-from app.core.security import verify_token
+from app.core.auth import get_current_user_id
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,38 +16,15 @@ def generate_stream_key() -> str:
     """Generate unique stream key for channel"""
     return secrets.token_urlsafe(32)
 
-async def get_current_user_id(request: Request) -> int:
-    """Get current user ID from JWT token"""
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    payload = verify_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    return int(user_id)
-
 @router.get("", response_model=list[ChannelResponse])
 async def get_channels(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
     is_live: bool = None,
     user_id: int = None,
-    db: Session = Depends(get_db)
+    cursor: str = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get all channels with optional filtering"""
     
@@ -58,12 +36,12 @@ async def get_channels(
     if is_live is not None:
         query = query.filter(Channel.is_live == is_live)
     
-    channels = query.offset(skip).limit(limit).all()
+    channels = paginate(query, Channel, response, cursor=cursor, skip=skip, limit=limit)
     
     return channels
 
 @router.get("/{channel_id}", response_model=ChannelResponse)
-async def get_channel(channel_id: int, db: Session = Depends(get_db)):
+async def get_channel(channel_id: int, db: Session = Depends(get_read_db)):
     """Get channel by ID"""
     
     channel = db.query(Channel).filter(Channel.id == channel_id).first()
@@ -186,7 +164,7 @@ async def get_my_channel(
     return channel
 
 @router.get("/{channel_id}/stream-key")
-async def get_stream_key(channel_id: int, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+async def get_stream_key(channel_id: int, user_id: int = Depends(get_current_user_id), db: Session = Depends(get_read_db)):
     """Get stream key (only owner can access)"""
     
     channel = db.query(Channel).filter(Channel.id == channel_id).first()
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.metrics import chat_connections, chat_messages_total, chat_deliveries_total, chat_broadcast_seconds
 from app.models.models import Channel, Stream, User
+from app.services.trending import trending_board
 from datetime import datetime
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -20,24 +23,37 @@ class ConnectionManager:
         if stream_key not in self.active_connections:
             self.active_connections[stream_key] = []
         self.active_connections[stream_key].append(websocket)
+        chat_connections.inc()
         logger.info(f"Client connected to stream {stream_key}. Total connections: {len(self.active_connections[stream_key])}")
 
     def disconnect(self, stream_key: str, websocket: WebSocket):
-        if stream_key in self.active_connections:
+        # A failed broadcast and the endpoint's own cleanup can both get here
+        if websocket in self.active_connections.get(stream_key, []):
             self.active_connections[stream_key].remove(websocket)
+            chat_connections.dec()
             logger.info(f"Client disconnected from stream {stream_key}. Total connections: {len(self.active_connections[stream_key])}")
 
     async def broadcast(self, stream_key: str, message: dict):
         """Broadcast message to all connected clients for a stream"""
         if stream_key in self.active_connections:
+            started = time.perf_counter()
+            chat_messages_total.inc()
+            # Snapshot: clients may join or leave while we await sends
+            connections = list(self.active_connections[stream_key])
             disconnected = []
-            for connection in self.active_connections[stream_key]:
+            for connection in connections:
                 try:
                     await connection.send_json(message)
                 except Exception as e:
                     logger.error(f"Error sending message: {e}")
                     disconnected.append(connection)
             
+            delivered = len(connections) - len(disconnected)
+            chat_deliveries_total.labels(result="ok").inc(delivered)
+            if disconnected:
+                chat_deliveries_total.labels(result="failed").inc(len(disconnected))
+            chat_broadcast_seconds.observe(time.perf_counter() - started)
+            
             # Remove disconnected clients
             for conn in disconnected:
                 self.disconnect(stream_key, conn)
@@ -50,6 +66,8 @@ async def websocket_chat_endpoint(websocket: WebSocket, stream_key: str, db: Ses
     
     # Verify stream exists
     channel = db.query(Channel).filter(Channel.stream_key == stream_key).first()
+    # The socket may stay open for hours; don't pin a pooled connection to it
+    db.close()
     if not channel:
         await websocket.close(code=status.WS_1000_NORMAL_CLOSURE, reason="Stream not found")
         return
@@ -95,6 +113,7 @@ async def websocket_chat_endpoint(websocket: WebSocket, stream_key: str, db: Ses
             
             # Broadcast to all connected clients
             await manager.broadcast(stream_key, broadcast_message)
+            trending_board.record_chat(channel.id)
     
     except WebSocketDisconnect:
         manager.disconnect(stream_key, websocket)
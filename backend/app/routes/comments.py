@@ -1,45 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload
+from app.core.auth import get_current_user
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.pagination import paginate
+from app.core.pubsub import pubsub
 from app.models.models import Comment, Stream, User
 from app.schemas.schemas import CommentResponse, CommentCreate, CommentUpdate
 from datetime import datetime
+from typing import Optional
+import asyncio
+import json
 
 router = APIRouter(prefix="/api", tags=["comments"])
 
-async def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
-    """Get current user from JWT token in request"""
-    from app.core.security import verify_token
-    
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    payload = verify_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
+def query_comments(db: Session):
+    """Comments with their author joined in the same SELECT, limited to the columns UserResponse renders"""
+    return db.query(Comment).options(
+        joinedload(Comment.user, innerjoin=True).load_only(
+            User.id, User.username, User.email, User.full_name,
+            User.avatar_url, User.bio, User.is_active, User.created_at
         )
-    
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+    )
+
+def comments_topic(stream_id: int) -> str:
+    return f"comments:{stream_id}"
+
+async def publish_comment_event(event_type: str, comment: dict) -> None:
+    """Push a change to every page open on the video (WebSocket and SSE subscribers)"""
+    await pubsub.publish(comments_topic(comment["stream_id"]), {"type": event_type, "comment": comment})
+
+def _adjust_counters(db: Session, stream_id: int, parent_id: Optional[int], delta: int, replies: int = 0) -> None:
+    """Shift the materialized counters in SQL, so concurrent requests cannot lose an update"""
+    db.query(Stream).filter(Stream.id == stream_id).update(
+        {Stream.comment_count: Stream.comment_count + delta}, synchronize_session=False
+    )
+    if parent_id is not None and replies:
+        db.query(Comment).filter(Comment.id == parent_id).update(
+            {Comment.reply_count: Comment.reply_count + replies}, synchronize_session=False
         )
-    
-    return user
 
 # POST /api/videos/{stream_id}/comments - Create comment
 @router.post("/videos/{stream_id}/comments", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
@@ -51,77 +51,99 @@ async def create_comment(
 ):
     """Create a new comment on a video"""
     # Check if stream exists
-    stream = db.query(Stream).filter(Stream.id == stream_id).first()
+    stream = db.query(Stream.id).filter(Stream.id == stream_id).first()
     if not stream:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Видео не найдено"
         )
     
+    parent_id = None
+    if comment_data.parent_id is not None:
+        parent = db.query(Comment.id, Comment.stream_id, Comment.parent_id).filter(
+            Comment.id == comment_data.parent_id
+        ).first()
+        if not parent or parent.stream_id != stream_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Комментарий не найден"
+            )
+        # A reply to a reply joins the thread of the top-level comment
+        parent_id = parent.parent_id or parent.id
+    
     # Create comment
     comment = Comment(
         stream_id=stream_id,
         user_id=current_user.id,
+        parent_id=parent_id,
         text=comment_data.text
     )
     
     db.add(comment)
+    _adjust_counters(db, stream_id, parent_id, 1, replies=1)
     db.commit()
-    db.refresh(comment)
-    
-    # Load user data
-    comment.user = current_user
     
+    # Reload with the author in one query
+    comment = query_comments(db).filter(Comment.id == comment.id).one()
+    await publish_comment_event("comment.created", CommentResponse.model_validate(comment).model_dump(mode="json"))
     return comment
 
 # GET /api/videos/{stream_id}/comments - Get all comments for a video
 @router.get("/videos/{stream_id}/comments", response_model=list[CommentResponse])
 async def get_comments(
     stream_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: str = None
 ):
-    """Get all comments for a video"""
+    """Get top-level comments for a video; replies load through /comments/{id}/replies"""
     # Check if stream exists
-    stream = db.query(Stream).filter(Stream.id == stream_id).first()
+    stream = db.query(Stream.id).filter(Stream.id == stream_id).first()
     if not stream:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Видео не найдено"
         )
     
-    comments = db.query(Comment).filter(
-        Comment.stream_id == stream_id
-    ).order_by(
-        Comment.created_at.desc()
-    ).offset(skip).limit(limit).all()
-    
-    # Load user data for each comment
-    for comment in comments:
-        user = db.query(User).filter(User.id == comment.user_id).first()
-        comment.user = user
+    query = query_comments(db).filter(Comment.stream_id == stream_id, Comment.parent_id.is_(None))
+    return paginate(query, Comment, response, cursor=cursor, skip=skip, limit=limit)
+
+# GET /api/comments/{comment_id}/replies - Get replies in a thread
+@router.get("/comments/{comment_id}/replies", response_model=list[CommentResponse])
+async def get_replies(
+    comment_id: int,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    limit: int = 20,
+    cursor: str = None
+):
+    """Get replies to a comment, newest first, one cursor page at a time"""
+    parent = db.query(Comment.id).filter(Comment.id == comment_id).first()
+    if not parent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Комментарий не найден"
+        )
     
-    return comments
+    query = query_comments(db).filter(Comment.parent_id == comment_id)
+    return paginate(query, Comment, response, cursor=cursor, limit=limit)
 
 # GET /api/comments/{comment_id} - Get specific comment
 @router.get("/comments/{comment_id}", response_model=CommentResponse)
 async def get_comment(
     comment_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get specific comment"""
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = query_comments(db).filter(Comment.id == comment_id).first()
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Комментарий не найден"
         )
     
-    # Load user data
-    user = db.query(User).filter(User.id == comment.user_id).first()
-    comment.user = user
-    
     return comment
 
 # PUT /api/comments/{comment_id} - Update comment
@@ -150,12 +172,10 @@ async def update_comment(
     comment.updated_at = datetime.utcnow()
     
     db.commit()
-    db.refresh(comment)
-    
-    # Load user data
-    user = db.query(User).filter(User.id == comment.user_id).first()
-    comment.user = user
     
+    # Reload with the author in one query
+    comment = query_comments(db).filter(Comment.id == comment_id).one()
+    await publish_comment_event("comment.updated", CommentResponse.model_validate(comment).model_dump(mode="json"))
     return comment
 
 # DELETE /api/comments/{comment_id} - Delete comment
@@ -179,7 +199,72 @@ async def delete_comment(
             detail="Вы не можете удалять чужой комментарий"
         )
     
+    # Replies go with their thread; count them before they disappear
+    removed = 1 + db.query(Comment).filter(Comment.parent_id == comment.id).delete(synchronize_session=False)
+    _adjust_counters(db, comment.stream_id, comment.parent_id, -removed, replies=-1)
+    deleted = {"id": comment.id, "stream_id": comment.stream_id, "parent_id": comment.parent_id}
     db.delete(comment)
     db.commit()
     
+    await publish_comment_event("comment.deleted", deleted)
     return None
+
+# WebSocket /api/videos/{stream_id}/comments/ws - Live comment events
+@router.websocket("/videos/{stream_id}/comments/ws")
+async def comments_websocket(websocket: WebSocket, stream_id: int, db: Session = Depends(get_read_db)):
+    """Push comment.created / comment.updated / comment.deleted events for a video"""
+    stream = db.query(Stream.id).filter(Stream.id == stream_id).first()
+    # The socket may stay open for hours; don't pin a pooled connection to it
+    db.close()
+    if not stream:
+        await websocket.close(code=status.WS_1000_NORMAL_CLOSURE, reason="Video not found")
+        return
+    
+    await websocket.accept()
+    async with await pubsub.subscribe(comments_topic(stream_id)) as subscription:
+        async def forward():
+            while True:
+                await websocket.send_json(await subscription.get())
+        
+        sender = asyncio.create_task(forward())
+        try:
+            # Nothing is expected from the client; reading is how we notice it left
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            sender.cancel()
+
+# GET /api/videos/{stream_id}/comments/events - Live comment events (SSE)
+@router.get("/videos/{stream_id}/comments/events")
+async def comment_events(stream_id: int, request: Request, db: Session = Depends(get_read_db)):
+    """Server-sent events fallback for clients that cannot open a WebSocket"""
+    stream = db.query(Stream.id).filter(Stream.id == stream_id).first()
+    # The response streams for as long as the page is open
+    db.close()
+    if not stream:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Видео не найдено"
+        )
+    
+    async def event_stream():
+        # Subscribed here, not before the response: a client gone before the
+        # first chunk never starts the generator, so nothing would close it
+        async with await pubsub.subscribe(comments_topic(stream_id)) as subscription:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=settings.sse_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['comment'])}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.orm import Session
+from app.core.auth import get_current_user_id
+from app.core.database import get_read_db
+from app.core.pagination import check_limit
+from app.schemas.schemas import NotificationResponse
+from app.services.notifications import inbox_page
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/notifications", tags=["notifications"])
+
+@router.get("", response_model=list[NotificationResponse])
+async def get_notifications(
+    request: Request,
+    response: Response,
+    limit: int = 20,
+    cursor: str = None,
+    db: Session = Depends(get_read_db)
+):
+    """Events of followed channels (went live, scheduled stream starting), newest first"""
+    user_id = await get_current_user_id(request)
+    check_limit(limit)
+    
+    events = inbox_page(db, user_id, response, cursor=cursor, limit=limit)
+    
+    return [
+        {
+            "id": event.id,
+            "event_type": event.event_type,
+            "title": event.title,
+            "channel_id": event.channel_id,
+            "channel_title": event.channel.title,
+            "channel_thumbnail_url": event.channel.thumbnail_url,
+            "stream_id": event.stream_id,
+            "schedule_id": event.schedule_id,
+            "created_at": event.created_at,
+        }
+        for event in events
+    ]
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Request, Depends
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.models.models import User, Stream, Channel
+from app.services.notifications import EVENT_STREAM_LIVE, notification_worker, record_channel_event
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,14 +59,20 @@ async def rtmp_publish(
                 created_at=datetime.utcnow()
             )
             db.add(stream)
+            db.flush()
+            # Подписчиков оповещает фоновый воркер, здесь только запись события
+            record_channel_event(db, channel.id, EVENT_STREAM_LIVE, title=stream.title, stream_id=stream.id)
             db.commit()
             db.refresh(stream)
+            notification_worker.wake()
             logger.info(f"📹 Created new live stream for channel {channel.id}")
         else:
             # Обновляем статус существующего стрима на is_live=True
             if not stream.is_live:
                 stream.is_live = True
+                record_channel_event(db, channel.id, EVENT_STREAM_LIVE, title=stream.title, stream_id=stream.id)
                 db.commit()
+                notification_worker.wake()
                 logger.info(f"📹 Updated existing stream {stream.id} to is_live=True")
             else:
                 logger.info(f"📹 Stream {stream.id} already is_live=True")
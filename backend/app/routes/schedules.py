@@ -1,53 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from datetime import datetime
-from app.core.database import get_db
-from app.core.security import verify_token
-from app.models.models import Schedule, Channel, User
-from app.schemas.schemas import ScheduleCreate, ScheduleUpdate, ScheduleResponse
+from datetime import datetime, timedelta
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.auth import get_current_user_id, get_current_user_or_404
+from app.core.pagination import NEXT_CURSOR_HEADER, check_limit, decode_cursor, encode_cursor
+from app.models.models import Schedule, Channel, Subscription, User
+from app.schemas.schemas import ScheduleCreate, ScheduleUpdate, ScheduleResponse, UpcomingScheduleResponse
+from app.services.scheduler import announce_schedules_changed
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
-    """Get current user from JWT token"""
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    payload = verify_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    return user
-
 router = APIRouter(prefix="/api/schedules", tags=["schedules"])
 
+# user_id -> (days, limit, items, next_cursor) of the first page of the
+# followed-channels planner; changes show up within the TTL
+_upcoming_cache = TTLCache(maxsize=settings.upcoming_cache_size, ttl=settings.upcoming_cache_ttl_seconds)
+
+MAX_UPCOMING_DAYS = 30
+MAX_UPCOMING_LIMIT = 100
+
 # Create schedule
 @router.post("", response_model=ScheduleResponse, status_code=status.HTTP_201_CREATED)
 async def create_schedule(
     schedule_data: ScheduleCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_or_404),
     db: Session = Depends(get_db)
 ):
     # Verify that the channel belongs to the current user
@@ -73,6 +53,7 @@ async def create_schedule(
     db.add(db_schedule)
     db.commit()
     db.refresh(db_schedule)
+    await announce_schedules_changed()
     
     return db_schedule
 
@@ -80,7 +61,7 @@ async def create_schedule(
 @router.get("/channel/{channel_id}", response_model=list[ScheduleResponse])
 async def get_channel_schedules(
     channel_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     channel = db.query(Channel).filter(Channel.id == channel_id).first()
     if not channel:
@@ -96,7 +77,7 @@ async def get_channel_schedules(
 @router.get("/{schedule_id}", response_model=ScheduleResponse)
 async def get_schedule(
     schedule_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     schedule = db.query(Schedule).filter(Schedule.id == schedule_id).first()
     if not schedule:
@@ -109,7 +90,7 @@ async def get_schedule(
 async def update_schedule(
     schedule_id: int,
     schedule_data: ScheduleUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_or_404),
     db: Session = Depends(get_db)
 ):
     schedule = db.query(Schedule).filter(Schedule.id == schedule_id).first()
@@ -132,12 +113,16 @@ async def update_schedule(
         schedule.description = schedule_data.description
     if schedule_data.scheduled_at:
         schedule.scheduled_at = schedule_data.scheduled_at
+        # Moved to a new time: remind followers again before it
+        schedule.notified_at = None
     
     schedule.updated_at = datetime.utcnow()
     
     db.add(schedule)
     db.commit()
     db.refresh(schedule)
+    if schedule_data.scheduled_at:
+        await announce_schedules_changed()
     
     return schedule
 
@@ -145,7 +130,7 @@ async def update_schedule(
 @router.delete("/{schedule_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_schedule(
     schedule_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_or_404),
     db: Session = Depends(get_db)
 ):
     schedule = db.query(Schedule).filter(Schedule.id == schedule_id).first()
@@ -159,26 +144,90 @@ async def delete_schedule(
     
     db.delete(schedule)
     db.commit()
+    await announce_schedules_changed()
     
     return None
 
 # Get upcoming schedules for user's channels
 @router.get("/user/upcoming", response_model=list[ScheduleResponse])
 async def get_upcoming_schedules(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_or_404),
+    db: Session = Depends(get_read_db)
 ):
-    # Get all user's channels
-    channels = db.query(Channel).filter(Channel.user_id == current_user.id).all()
-    channel_ids = [ch.id for ch in channels]
-    
-    if not channel_ids:
-        return []
-    
-    # Get upcoming schedules
-    schedules = db.query(Schedule).filter(
-        Schedule.channel_id.in_(channel_ids),
+    # Channels are joined in the same query instead of loaded first
+    schedules = db.query(Schedule).join(Channel, Channel.id == Schedule.channel_id).filter(
+        Channel.user_id == current_user.id,
         Schedule.scheduled_at > datetime.utcnow()
     ).order_by(Schedule.scheduled_at).all()
     
     return schedules
+
+# Get upcoming schedules from channels the user follows
+@router.get("/following/upcoming", response_model=list[UpcomingScheduleResponse])
+async def get_following_upcoming_schedules(
+    response: Response,
+    days: int = 7,
+    limit: int = 20,
+    cursor: str = None,
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Schedules of followed channels in the next `days` days, soonest first.
+
+    One join of subscriptions to schedules that seeks on
+    (channel_id, scheduled_at) per followed channel; pages continue from
+    the X-Next-Cursor header.
+    """
+    if not 1 <= days <= MAX_UPCOMING_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"days must be between 1 and {MAX_UPCOMING_DAYS}"
+        )
+    check_limit(limit, MAX_UPCOMING_LIMIT)
+    
+    if not cursor:
+        cached = _upcoming_cache.get(user_id)
+        if cached is not None and cached[:2] == (days, limit):
+            items, next_cursor = cached[2:]
+            if next_cursor:
+                response.headers[NEXT_CURSOR_HEADER] = next_cursor
+            return items
+    
+    now = datetime.utcnow()
+    query = (
+        db.query(Schedule, Channel.title, Channel.thumbnail_url)
+        .join(Subscription, Subscription.channel_id == Schedule.channel_id)
+        .join(Channel, Channel.id == Schedule.channel_id)
+        .filter(
+            Subscription.subscriber_id == user_id,
+            Schedule.scheduled_at > now,
+            Schedule.scheduled_at <= now + timedelta(days=days)
+        )
+        .order_by(Schedule.scheduled_at, Schedule.id)
+    )
+    if cursor:
+        scheduled_at, schedule_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Schedule.scheduled_at, Schedule.id) > tuple_(scheduled_at, schedule_id))
+    
+    # One extra row tells whether another page exists
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1].Schedule
+        next_cursor = encode_cursor(last.scheduled_at, last.id)
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    
+    items = [
+        {
+            **ScheduleResponse.model_validate(schedule).model_dump(),
+            "channel_title": channel_title,
+            "channel_thumbnail_url": channel_thumbnail_url,
+        }
+        for schedule, channel_title, channel_thumbnail_url in rows
+    ]
+    if not cursor:
+        _upcoming_cache.set(user_id, (days, limit, items, next_cursor))
+    
+    return items
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_read_db
+from app.schemas.schemas import StreamSearchResult, ChannelSearchResult, UserSearchResult, SearchSuggestion
+from app.services.search import SEARCH_STREAMS, SEARCH_CHANNELS, SEARCH_USERS, search_page, suggest
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+def _check_limit(limit: int) -> None:
+    if not 1 <= limit <= settings.search_max_limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {settings.search_max_limit}"
+        )
+
+@router.get("/streams", response_model=list[StreamSearchResult])
+async def search_streams(
+    q: str,
+    response: Response,
+    limit: int = 20,
+    cursor: str = None,
+    db: Session = Depends(get_read_db)
+):
+    """Live streams and recordings matching every word of `q` as a prefix, best first"""
+    _check_limit(limit)
+    return search_page(db, SEARCH_STREAMS, q, response, cursor=cursor, limit=limit)
+
+@router.get("/channels", response_model=list[ChannelSearchResult])
+async def search_channels(
+    q: str,
+    response: Response,
+    limit: int = 20,
+    cursor: str = None,
+    db: Session = Depends(get_read_db)
+):
+    """Channels matching `q` in title or description, live and watched ones ranked higher"""
+    _check_limit(limit)
+    return search_page(db, SEARCH_CHANNELS, q, response, cursor=cursor, limit=limit)
+
+@router.get("/users", response_model=list[UserSearchResult])
+async def search_users(
+    q: str,
+    response: Response,
+    limit: int = 20,
+    cursor: str = None,
+    db: Session = Depends(get_read_db)
+):
+    """Active users matching `q` in username or full name"""
+    _check_limit(limit)
+    return search_page(db, SEARCH_USERS, q, response, cursor=cursor, limit=limit)
+
+@router.get("/suggest", response_model=list[SearchSuggestion])
+async def search_suggest(
+    q: str,
+    limit: int = 10,
+    db: Session = Depends(get_read_db)
+):
+    """Autocomplete: channel titles and usernames starting with `q`"""
+    _check_limit(limit)
+    return suggest(db, q, limit=limit)
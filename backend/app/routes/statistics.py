@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta, date
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.models.models import Channel, Stream, StreamView, Statistic
 from app.schemas.schemas import StatisticResponse, ChannelStats
 import logging
@@ -12,7 +13,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/statistics", tags=["statistics"])
 
 @router.get("/channel/{channel_id}", response_model=ChannelStats)
-async def get_channel_stats(channel_id: int, db: Session = Depends(get_db)):
+async def get_channel_stats(channel_id: int, db: Session = Depends(get_read_db)):
     """Get channel statistics"""
     
     channel = db.query(Channel).filter(Channel.id == channel_id).first()
@@ -54,7 +55,7 @@ async def get_channel_stats(channel_id: int, db: Session = Depends(get_db)):
 async def get_channel_daily_stats(
     channel_id: int,
     days: int = 30,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get daily statistics for last N days"""
     
@@ -82,7 +83,7 @@ async def get_channel_daily_stats(
 async def get_top_streams(
     channel_id: int,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get top streams by view count"""
     
@@ -102,7 +103,7 @@ async def get_top_streams(
 
 @router.post("/channel/{channel_id}/record-daily-stats")
 async def record_daily_stats(channel_id: int, db: Session = Depends(get_db)):
-    """Record daily statistics (usually called by scheduler)"""
+    """Record today's statistics for one channel now (the scheduler rolls up all channels nightly)"""
     
     channel = db.query(Channel).filter(Channel.id == channel_id).first()
     
@@ -151,14 +152,21 @@ async def record_daily_stats(channel_id: int, db: Session = Depends(get_db)):
     )
     
     db.add(statistic)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Stats already recorded for today"
+        )
     
     logger.info(f"Daily stats recorded for channel {channel_id}")
     
     return statistic
 
 @router.get("/user/{user_id}/overview")
-async def get_user_overview(user_id: int, db: Session = Depends(get_db)):
+async def get_user_overview(user_id: int, db: Session = Depends(get_read_db)):
     """Get overview statistics for user's channels"""
     
     # Get all user channels
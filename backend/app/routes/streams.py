@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Response, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from sqlalchemy import func
 from datetime import datetime, timedelta
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.pagination import paginate
 from app.models.models import Stream, Channel, User, StreamView, Subscription
 from app.schemas.schemas import StreamCreate, StreamResponse, StreamUpdate, StreamStatus, StreamWithUserResponse
+from app.services.notifications import EVENT_STREAM_LIVE, notification_worker, record_channel_event
+from app.services.trending import trending_board
 import logging
 import shutil
 from pathlib import Path
@@ -19,6 +22,8 @@ UPLOAD_DIR = Path("uploads")
 STREAMS_DIR = UPLOAD_DIR / "streams"
 STREAMS_DIR.mkdir(parents=True, exist_ok=True)
 
+MAX_TRENDING_LIMIT = 100
+
 def sanitize_text(text: str) -> str:
     """Sanitize user input to prevent XSS attacks"""
     if not text:
@@ -26,17 +31,51 @@ def sanitize_text(text: str) -> str:
     # Escape HTML special characters
     return html.escape(text)
 
+def _stream_with_user(stream: Stream) -> dict:
+    """Listing entry of a stream with its channel and creator loaded"""
+    return {
+        "id": stream.id,
+        "channel_id": stream.channel_id,
+        "title": stream.title,
+        "description": stream.description,
+        "thumbnail_url": stream.thumbnail_url,
+        "cover_image_url": stream.cover_image_url,
+        "duration": stream.duration,
+        "is_live": stream.is_live,
+        "is_archived": stream.is_archived,
+        "view_count": stream.view_count,
+        "comment_count": stream.comment_count,
+        "started_at": stream.started_at,
+        "ended_at": stream.ended_at,
+        "created_at": stream.created_at,
+        "updated_at": stream.updated_at,
+        "creator_name": stream.channel.user.full_name or stream.channel.user.username,
+        "profile_image": stream.channel.user.avatar_url,
+        "channel": {
+            "id": stream.channel.id,
+            "user_id": stream.channel.user_id,
+            "username": stream.channel.user.username,
+            "avatar": stream.channel.user.avatar_url,
+            "bio": stream.channel.user.bio,
+            "stream_key": stream.channel.stream_key,
+            "is_live": stream.channel.is_live,
+            "viewers_count": stream.channel.viewers_count
+        }
+    }
+
 @router.get("", response_model=list[StreamWithUserResponse])
 async def get_streams(
+    response: Response,
     channel_id: int = None,
     is_live: bool = None,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    cursor: str = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get streams with optional filtering - shows only live streams for public listing"""
     
-    logger.info(f"Getting streams: channel_id={channel_id}, is_live={is_live}, skip={skip}, limit={limit}")
+    logger.info(f"Getting streams: channel_id={channel_id}, is_live={is_live}, skip={skip}, limit={limit}, cursor={cursor}")
     
     query = db.query(Stream).join(Channel).join(User)
     
@@ -50,58 +89,72 @@ async def get_streams(
         # Если не указано явно, показываем только живые стримы
         query = query.filter(Stream.is_live == True)
     
-    streams = query.order_by(Stream.created_at.desc()).offset(skip).limit(limit).all()
+    streams = paginate(query, Stream, response, cursor=cursor, skip=skip, limit=limit)
     logger.info(f"Found {len(streams)} streams")
     
     # Convert to response with user info
-    result = []
-    for stream in streams:
-        stream_dict = {
-            "id": stream.id,
-            "channel_id": stream.channel_id,
-            "title": stream.title,
-            "description": stream.description,
-            "thumbnail_url": stream.thumbnail_url,
-            "cover_image_url": stream.cover_image_url,
-            "duration": stream.duration,
-            "is_live": stream.is_live,
-            "is_archived": stream.is_archived,
-            "view_count": stream.view_count,
-            "started_at": stream.started_at,
-            "ended_at": stream.ended_at,
-            "created_at": stream.created_at,
-            "updated_at": stream.updated_at,
-            "creator_name": stream.channel.user.full_name or stream.channel.user.username,
-            "profile_image": stream.channel.user.avatar_url,
-            "channel": {
-                "id": stream.channel.id,
-                "user_id": stream.channel.user_id,
-                "username": stream.channel.user.username,
-                "avatar": stream.channel.user.avatar_url,
-                "bio": stream.channel.user.bio,
-                "stream_key": stream.channel.stream_key,
-                "is_live": stream.channel.is_live,
-                "viewers_count": stream.channel.viewers_count
-            }
-        }
-        result.append(stream_dict)
+    return [_stream_with_user(stream) for stream in streams]
+
+@router.get("/trending", response_model=list[StreamWithUserResponse])
+async def get_trending_streams(
+    live: bool = False,
+    skip: int = 0,
+    limit: int = 20,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Streams by trending score: recent views, chat activity and viewers, decayed over time.
+
+    The ranking is precomputed by the scheduler leader; this reads one
+    slice of it and loads just those streams. `live=true` keeps live
+    streams only. Until this worker has received a ranking, live streams
+    are ordered by current viewers.
+    """
+    if not 1 <= limit <= MAX_TRENDING_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {MAX_TRENDING_LIMIT}"
+        )
     
-    return result
+    stream_ids = trending_board.top(live_only=live, skip=skip, limit=limit)
+    if stream_ids is None:
+        streams = (
+            db.query(Stream)
+            .join(Channel)
+            .options(contains_eager(Stream.channel).joinedload(Channel.user))
+            .filter(Stream.is_live == True)
+            .order_by(Channel.viewers_count.desc(), Stream.created_at.desc(), Stream.id.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        return [_stream_with_user(stream) for stream in streams]
+    
+    if not stream_ids:
+        return []
+    query = db.query(Stream).options(joinedload(Stream.channel).joinedload(Channel.user)).filter(Stream.id.in_(stream_ids))
+    if live:
+        # The ranking can be up to TRENDING_REFRESH_SECONDS old
+        query = query.filter(Stream.is_live == True)
+    streams = {stream.id: stream for stream in query}
+    return [_stream_with_user(streams[stream_id]) for stream_id in stream_ids if stream_id in streams]
 
 @router.get("/channel/{channel_id}/all", response_model=list[StreamWithUserResponse])
 async def get_all_channel_streams(
     channel_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    cursor: str = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get all streams for a channel (including non-live) - for profile page"""
     
-    logger.info(f"Getting all streams for channel: {channel_id}, skip={skip}, limit={limit}")
+    logger.info(f"Getting all streams for channel: {channel_id}, skip={skip}, limit={limit}, cursor={cursor}")
     
-    query = db.query(Stream).filter(Stream.channel_id == channel_id).order_by(Stream.created_at.desc())
+    query = db.query(Stream).filter(Stream.channel_id == channel_id)
     
-    streams = query.offset(skip).limit(limit).all()
+    streams = paginate(query, Stream, response, cursor=cursor, skip=skip, limit=limit)
     logger.info(f"Found {len(streams)} streams for channel {channel_id}")
     
     # Convert to response with user info
@@ -123,6 +176,7 @@ async def get_all_channel_streams(
             "is_live": stream.is_live,
             "is_archived": stream.is_archived,
             "view_count": stream.view_count,
+            "comment_count": stream.comment_count,
             "started_at": stream.started_at,
             "ended_at": stream.ended_at,
             "created_at": stream.created_at,
@@ -147,13 +201,15 @@ async def get_all_channel_streams(
 @router.get("/user/{user_id}/videos", response_model=list[StreamWithUserResponse])
 async def get_user_videos(
     user_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    cursor: str = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get all archived videos for a user"""
     
-    logger.info(f"Getting videos for user: {user_id}, skip={skip}, limit={limit}")
+    logger.info(f"Getting videos for user: {user_id}, skip={skip}, limit={limit}, cursor={cursor}")
     
     # Get user
     user = db.query(User).filter(User.id == user_id).first()
@@ -174,10 +230,11 @@ async def get_user_videos(
     channel_ids = [ch.id for ch in channels]
     
     # Get archived videos from all user's channels
-    streams = db.query(Stream).filter(
+    query = db.query(Stream).filter(
         Stream.channel_id.in_(channel_ids),
         Stream.is_archived == True
-    ).order_by(Stream.created_at.desc()).offset(skip).limit(limit).all()
+    )
+    streams = paginate(query, Stream, response, cursor=cursor, skip=skip, limit=limit)
     
     result = []
     for stream in streams:
@@ -196,6 +253,7 @@ async def get_user_videos(
             "cover_image_url": stream.cover_image_url,
             "duration": stream.duration or 0,
             "view_count": stream.view_count or 0,
+            "comment_count": stream.comment_count,
             "started_at": stream.started_at,
             "ended_at": stream.ended_at,
             "stream_key": stream.channel.stream_key,
@@ -231,7 +289,7 @@ async def get_user_videos(
     return result
 
 @router.get("/by-key/{stream_key}", response_model=StreamWithUserResponse)
-async def get_stream_by_key(stream_key: str, response: Response, db: Session = Depends(get_db)):
+async def get_stream_by_key(stream_key: str, response: Response, db: Session = Depends(get_read_db)):
     """Get stream by stream key (from channel)"""
     
     # Добавляем заголовки для отключения кеширования
@@ -276,6 +334,7 @@ async def get_stream_by_key(stream_key: str, response: Response, db: Session = D
         "is_live": stream.is_live,
         "is_archived": stream.is_archived,
         "view_count": stream.view_count,
+        "comment_count": stream.comment_count,
         "created_at": stream.created_at,
         "updated_at": stream.updated_at,
         "channel": {
@@ -293,7 +352,7 @@ async def get_stream_by_key(stream_key: str, response: Response, db: Session = D
     return response
 
 @router.get("/{stream_id}", response_model=StreamWithUserResponse)
-async def get_stream(stream_id: int, db: Session = Depends(get_db)):
+async def get_stream(stream_id: int, db: Session = Depends(get_read_db)):
     """Get stream by ID"""
     
     stream = db.query(Stream).filter(Stream.id == stream_id).first()
@@ -330,6 +389,7 @@ async def get_stream(stream_id: int, db: Session = Depends(get_db)):
         "is_live": stream.is_live,
         "is_archived": stream.is_archived,
         "view_count": stream.view_count or 0,
+        "comment_count": stream.comment_count,
         "started_at": stream.started_at,
         "ended_at": stream.ended_at,
         "created_at": stream.created_at,
@@ -481,8 +541,10 @@ async def start_stream(stream_id: int, db: Session = Depends(get_db)):
     stream.is_live = True
     stream.started_at = datetime.utcnow()
     stream.channel.is_live = True
+    record_channel_event(db, stream.channel_id, EVENT_STREAM_LIVE, title=stream.title, stream_id=stream.id)
     
     db.commit()
+    notification_worker.wake()
     
     logger.info(f"Stream started: {stream_id}")
     
@@ -536,7 +598,7 @@ async def stop_stream(stream_id: int, db: Session = Depends(get_db)):
     }
 
 @router.get("/{stream_id}/status", response_model=StreamStatus)
-async def get_stream_status(stream_id: int, db: Session = Depends(get_db)):
+async def get_stream_status(stream_id: int, db: Session = Depends(get_read_db)):
     """Get current stream status"""
     
     stream = db.query(Stream).filter(Stream.id == stream_id).first()
@@ -738,7 +800,8 @@ async def increment_view_count(
             detail="Video not found"
         )
     
-    # Increment view count
+    # Increment view count; the view row feeds unique viewers and trending
+    db.add(StreamView(stream_id=stream_id))
     stream.view_count = (stream.view_count or 0) + 1
     stream.updated_at = datetime.utcnow()
     
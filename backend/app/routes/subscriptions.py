@@ -1,40 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models.models import Subscription, Channel, User
-from app.schemas.schemas import SubscriptionResponse, SubscribedChannelResponse
-from app.core.security import verify_token
-from fastapi import Request
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy.exc import IntegrityError
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.pagination import paginate
+from app.models.models import Subscription, Channel, Stream, User
+from app.schemas.schemas import SubscriptionResponse, SubscribedChannelResponse, SubscriptionFeedItem, SubscriptionStateResponse
+from app.core.auth import get_current_user_id
+from fastapi import Request, Response
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/subscriptions", tags=["subscriptions"])
 
-async def get_current_user_id(request: Request) -> int:
-    """Get current user ID from JWT token"""
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    payload = verify_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
+# user_id -> frozenset of subscribed channel ids; dropped on (un)subscribe in
+# this worker, other workers catch up within the TTL
+_subscription_cache = TTLCache(maxsize=settings.subscription_cache_size, ttl=settings.subscription_cache_ttl_seconds)
+
+def subscribed_channel_ids(db: Session, user_id: int) -> frozenset:
+    """All channel ids the user is subscribed to (index-only scan on subscriber_id, channel_id)"""
+    channel_ids = _subscription_cache.get(user_id)
+    if channel_ids is None:
+        channel_ids = frozenset(
+            channel_id for (channel_id,) in
+            db.query(Subscription.channel_id).filter(Subscription.subscriber_id == user_id)
         )
-    
-    return int(user_id)
+        _subscription_cache.set(user_id, channel_ids)
+    return channel_ids
+
+def invalidate_subscriptions(user_id: int) -> None:
+    _subscription_cache.pop(user_id)
+
+# Feed rows carry two streams per channel; only the fields the cards render are selected
+live_stream = aliased(Stream, name="live_stream")
+latest_video = aliased(Stream, name="latest_video")
+FEED_STREAM_FIELDS = ("id", "title", "thumbnail_url", "cover_image_url", "duration", "view_count", "started_at", "created_at")
+
+def _newest_stream_id(*criteria):
+    """Id of the outer channel's newest stream matching criteria (one index probe per channel)"""
+    return (
+        select(Stream.id)
+        .where(Stream.channel_id == Channel.id, *criteria)
+        .order_by(Stream.created_at.desc(), Stream.id.desc())
+        .limit(1)
+        .correlate(Channel)
+        .scalar_subquery()
+    )
+
+def _stream_columns(alias, prefix: str) -> list:
+    return [getattr(alias, field).label(f"{prefix}_{field}") for field in FEED_STREAM_FIELDS]
+
+def _stream_from_row(row, prefix: str):
+    if getattr(row, f"{prefix}_id") is None:
+        return None
+    stream = {field: getattr(row, f"{prefix}_{field}") for field in FEED_STREAM_FIELDS}
+    stream["duration"] = stream["duration"] or 0
+    stream["view_count"] = stream["view_count"] or 0
+    return stream
 
 @router.post("/{channel_id}", response_model=SubscriptionResponse)
 async def subscribe_to_channel(
@@ -71,8 +96,17 @@ async def subscribe_to_channel(
         channel_id=channel_id
     )
     db.add(subscription)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request created it first (unique subscriber/channel index)
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Already subscribed to this channel"
+        )
     db.refresh(subscription)
+    invalidate_subscriptions(user_id)
     
     return subscription
 
@@ -99,6 +133,7 @@ async def unsubscribe_from_channel(
     
     db.delete(subscription)
     db.commit()
+    invalidate_subscriptions(user_id)
     
     return {"detail": "Unsubscribed successfully"}
 
@@ -110,17 +145,121 @@ async def get_user_subscriptions(
     """Get all channels user is subscribed to"""
     user_id = await get_current_user_id(request)
     
-    subscriptions = db.query(Subscription).filter(
-        Subscription.subscriber_id == user_id
-    ).all()
+    # Channels and their owners in one query
+    return (
+        db.query(Channel)
+        .join(Subscription, Subscription.channel_id == Channel.id)
+        .options(joinedload(Channel.user, innerjoin=True))
+        .filter(Subscription.subscriber_id == user_id)
+        .order_by(Subscription.created_at.desc(), Subscription.id.desc())
+        .all()
+    )
+
+@router.get("/feed", response_model=list[SubscriptionFeedItem])
+async def get_subscription_feed(
+    request: Request,
+    response: Response,
+    live: bool = False,
+    limit: int = 20,
+    cursor: str = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Followed channels with their current live stream and latest video, newest subscription first.
+
+    One query per page; `live=true` keeps only channels that are live now.
+    """
+    user_id = await get_current_user_id(request)
+    
+    query = (
+        db.query(
+            Subscription.id.label("id"),
+            Subscription.created_at.label("created_at"),
+            Channel.id.label("channel_id"),
+            Channel.user_id.label("channel_user_id"),
+            Channel.title.label("channel_title"),
+            Channel.thumbnail_url.label("channel_thumbnail_url"),
+            Channel.is_live.label("channel_is_live"),
+            Channel.viewers_count.label("channel_viewers_count"),
+            User.username.label("username"),
+            User.full_name.label("full_name"),
+            User.avatar_url.label("avatar_url"),
+            *_stream_columns(live_stream, "live"),
+            *_stream_columns(latest_video, "video"),
+        )
+        .join(Channel, Channel.id == Subscription.channel_id)
+        .join(User, User.id == Channel.user_id)
+        .outerjoin(live_stream, live_stream.id == _newest_stream_id(Stream.is_live == True))
+        .outerjoin(latest_video, latest_video.id == _newest_stream_id(Stream.is_archived == True))
+        .filter(Subscription.subscriber_id == user_id)
+    )
+    if live:
+        query = query.filter(live_stream.id.isnot(None))
+    
+    rows = paginate(query, Subscription, response, cursor=cursor, limit=limit)
+    
+    return [
+        {
+            "subscribed_at": row.created_at,
+            "channel": {
+                "id": row.channel_id,
+                "user_id": row.channel_user_id,
+                "title": row.channel_title,
+                "thumbnail_url": row.channel_thumbnail_url,
+                "username": row.username,
+                "creator_name": row.full_name or row.username,
+                "avatar": row.avatar_url,
+                "is_live": bool(row.channel_is_live),
+                "viewers_count": row.channel_viewers_count or 0,
+            },
+            "live_stream": _stream_from_row(row, "live"),
+            "latest_video": _stream_from_row(row, "video"),
+        }
+        for row in rows
+    ]
+
+@router.get("/state", response_model=SubscriptionStateResponse)
+async def get_subscription_state(
+    request: Request,
+    channel_ids: list[int] = Query([]),
+    user_ids: list[int] = Query([]),
+    db: Session = Depends(get_db)
+):
+    """
+    Subscription flags for every creator card on a page in one request.
+
+    Accepts channel ids and/or creator user ids (repeated query params).
+    The user's subscribed channels come from a short-lived per-worker
+    cache; user ids are resolved to channels with one IN query.
+    """
+    if len(channel_ids) + len(user_ids) > settings.subscription_state_max_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.subscription_state_max_ids} ids per request"
+        )
+    
+    try:
+        current_user_id = await get_current_user_id(request)
+    except HTTPException:
+        # Anonymous visitors are not subscribed to anything
+        return {
+            "channels": dict.fromkeys(channel_ids, False),
+            "users": dict.fromkeys(user_ids, False),
+        }
+    
+    subscribed = subscribed_channel_ids(db, current_user_id)
     
-    channels = []
-    for subscription in subscriptions:
-        channel = db.query(Channel).filter(Channel.id == subscription.channel_id).first()
-        if channel:
-            channels.append(channel)
+    users = dict.fromkeys(user_ids, False)
+    if user_ids:
+        owned = db.query(Channel.id, Channel.user_id).filter(Channel.user_id.in_(set(user_ids)))
+        for channel_id, owner_id in owned:
+            if channel_id in subscribed:
+                users[owner_id] = True
     
-    return channels
+    return {
+        "channels": {channel_id: channel_id in subscribed for channel_id in channel_ids},
+        "users": users,
+    }
 
 @router.get("/{channel_id}/is-subscribed")
 async def is_subscribed_to_channel(
@@ -4,7 +4,7 @@ from sqlalchemy import func
 from app.core.database import get_db
 from app.models.models import User, Channel, Subscription
 from app.schemas.schemas import UserResponse, UserUpdate, ChannelResponse
-from app.core.security import verify_token
+from app.core.auth import get_current_user_id, invalidate_user
 from fastapi import Request
 import logging
 import os
@@ -15,33 +15,6 @@ import uuid
 
 logger = logging.getLogger(__name__)
 
-import uuid
-
-async def get_current_user_id(request: Request) -> int:
-    """Get current user ID from JWT token"""
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    payload = verify_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    return int(user_id)
-
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 # File upload settings
@@ -202,6 +175,7 @@ async def update_user(
     
     db.commit()
     db.refresh(user)
+    invalidate_user(user_id)
     
     return user
 
@@ -262,6 +236,7 @@ async def delete_user(user_id: int, db: Session = Depends(get_db)):
     
     db.delete(user)
     db.commit()
+    invalidate_user(user_id)
     
     logger.info(f"User deleted: {user_id}")
     
@@ -305,6 +280,7 @@ async def upload_avatar(
     logger.info(f"Updated user avatar_url in memory: {user.avatar_url}")
     
     db.commit()
+    invalidate_user(user_id)
     logger.info(f"Database committed")
     
     db.refresh(user)
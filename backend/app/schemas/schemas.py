@@ -79,6 +79,7 @@ class StreamResponse(StreamBase):
     is_live: bool = False
     is_archived: bool = False
     view_count: int = 0
+    comment_count: int = 0
     started_at: Optional[datetime] = None
     ended_at: Optional[datetime] = None
     created_at: datetime
@@ -199,6 +200,95 @@ class SubscribedChannelResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class NotificationResponse(BaseModel):
+    id: int
+    event_type: str
+    title: Optional[str] = None
+    channel_id: int
+    channel_title: str
+    channel_thumbnail_url: Optional[str] = None
+    stream_id: Optional[int] = None
+    schedule_id: Optional[int] = None
+    created_at: datetime
+
+class SubscriptionStateResponse(BaseModel):
+    # Keyed by the requested channel ids and creator user ids
+    channels: dict[int, bool] = {}
+    users: dict[int, bool] = {}
+
+class FeedStreamResponse(BaseModel):
+    id: int
+    title: str
+    thumbnail_url: Optional[str] = None
+    cover_image_url: Optional[str] = None
+    duration: int = 0
+    view_count: int = 0
+    started_at: Optional[datetime] = None
+    created_at: datetime
+
+class FeedChannelResponse(BaseModel):
+    id: int
+    user_id: int
+    title: str
+    thumbnail_url: Optional[str] = None
+    username: str
+    creator_name: str
+    avatar: Optional[str] = None
+    is_live: bool = False
+    viewers_count: int = 0
+
+class SubscriptionFeedItem(BaseModel):
+    subscribed_at: datetime
+    channel: FeedChannelResponse
+    live_stream: Optional[FeedStreamResponse] = None
+    latest_video: Optional[FeedStreamResponse] = None
+
+# Search schemas: public fields only (no stream keys or emails)
+class StreamSearchResult(BaseModel):
+    id: int
+    channel_id: int
+    title: str
+    description: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    cover_image_url: Optional[str] = None
+    duration: int = 0
+    is_live: bool = False
+    view_count: int = 0
+    started_at: Optional[datetime] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ChannelSearchResult(BaseModel):
+    id: int
+    user_id: int
+    title: str
+    description: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    is_live: bool = False
+    viewers_count: int = 0
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class UserSearchResult(BaseModel):
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class SearchSuggestion(BaseModel):
+    type: str  # "channel" or "user"
+    id: int
+    text: str
+    image_url: Optional[str] = None
+    is_live: bool = False
+
 # Schedule schemas
 class ScheduleCreate(BaseModel):
     channel_id: int
@@ -223,18 +313,25 @@ class ScheduleResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class UpcomingScheduleResponse(ScheduleResponse):
+    channel_title: str
+    channel_thumbnail_url: Optional[str] = None
+
 # Comment schemas
 class CommentBase(BaseModel):
     text: str = Field(..., min_length=1, max_length=5000)
 
 class CommentCreate(CommentBase):
-    pass
+    # Reply to this comment; replies to a reply join the same thread
+    parent_id: Optional[int] = None
 
 class CommentResponse(CommentBase):
     id: int
     stream_id: int
     user_id: int
     user: Optional['UserResponse'] = None
+    parent_id: Optional[int] = None
+    reply_count: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -249,13 +346,16 @@ class CommentBase(BaseModel):
     text: str = Field(..., min_length=1, max_length=5000)
 
 class CommentCreate(CommentBase):
-    pass
+    # Reply to this comment; replies to a reply join the same thread
+    parent_id: Optional[int] = None
 
 class CommentResponse(CommentBase):
     id: int
     stream_id: int
     user_id: int
     user: Optional[UserResponse] = None
+    parent_id: Optional[int] = None
+    reply_count: int = 0
     created_at: datetime
     updated_at: datetime
 
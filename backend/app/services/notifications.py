@@ -0,0 +1,246 @@
+"""
+Follower notifications: fan-out on write, with fan-out on read for big channels
+
+Go-live and schedule events are queued with record_channel_event in the
+same transaction as the change that caused them - a single INSERT, so the
+RTMP publish hook never waits on followers. NotificationWorker, running
+in every web worker, then writes one inbox row per follower, paging
+through subscriptions by id:
+
+- every batch is its own short transaction;
+- the pending event is claimed with SELECT ... FOR UPDATE SKIP LOCKED, so
+  workers on all replicas share the queue without writing a batch twice;
+- the event keeps the last subscription id done, so a restart resumes the
+  fan-out where it stopped.
+
+Channels with more than NOTIFICATIONS_PUSH_MAX_FOLLOWERS followers are
+not fanned out ("pull" events). inbox_page merges them into each
+follower's inbox at read time instead of writing millions of rows per
+go-live.
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import Response
+from sqlalchemy import and_, func, insert, tuple_
+from sqlalchemy.orm import Session, joinedload
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import notification_events_total, notifications_written_total, notification_fanout_delay_seconds
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.models.models import Channel, ChannelEvent, Notification, Subscription
+
+logger = logging.getLogger(__name__)
+
+EVENT_STREAM_LIVE = "stream.live"
+EVENT_SCHEDULE_STARTING = "schedule.starting"
+
+FANOUT_PUSH = "push"
+FANOUT_PULL = "pull"
+
+def record_channel_event(
+    db: Session,
+    channel_id: int,
+    event_type: str,
+    title: Optional[str] = None,
+    stream_id: Optional[int] = None,
+    schedule_id: Optional[int] = None,
+) -> Optional[ChannelEvent]:
+    """
+    Queue an event for the channel's followers; the caller commits it with its own change.
+
+    A go-live within NOTIFICATIONS_COOLDOWN_SECONDS of the channel's last
+    one (an encoder reconnecting, say) is dropped and None is returned.
+    Schedule reminders are not: each schedule's notified_at already
+    guards them, and two schedules of a channel may start close together.
+    """
+    if event_type == EVENT_STREAM_LIVE:
+        since = datetime.utcnow() - timedelta(seconds=settings.notifications_cooldown_seconds)
+        recent = db.query(ChannelEvent.id).filter(
+            ChannelEvent.channel_id == channel_id,
+            ChannelEvent.event_type == event_type,
+            ChannelEvent.created_at >= since
+        ).first()
+        if recent:
+            return None
+
+    event = ChannelEvent(
+        channel_id=channel_id,
+        event_type=event_type,
+        title=title,
+        stream_id=stream_id,
+        schedule_id=schedule_id,
+        created_at=datetime.utcnow()
+    )
+    db.add(event)
+    return event
+
+def _has_more_followers(db: Session, channel_id: int, limit: int) -> bool:
+    # Counts at most limit + 1 rows, not every follower of a huge channel
+    followers = db.query(Subscription.id).filter(Subscription.channel_id == channel_id).limit(limit + 1).subquery()
+    return db.query(func.count()).select_from(followers).scalar() > limit
+
+def fan_out_batch(db: Session, batch_size: int = settings.notifications_batch_size) -> bool:
+    """Fan the oldest pending event out to one batch of followers; False when nothing is pending"""
+    event = (
+        db.query(ChannelEvent)
+        .filter(ChannelEvent.fanned_out_at.is_(None))
+        .order_by(ChannelEvent.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if event is None:
+        db.rollback()
+        return False
+
+    if event.fanout is None:
+        big = _has_more_followers(db, event.channel_id, settings.notifications_push_max_followers)
+        event.fanout = FANOUT_PULL if big else FANOUT_PUSH
+
+    done = True
+    if event.fanout == FANOUT_PUSH:
+        followers = (
+            db.query(Subscription.id, Subscription.subscriber_id)
+            .filter(
+                Subscription.channel_id == event.channel_id,
+                Subscription.id > event.fanout_cursor,
+                Subscription.created_at <= event.created_at
+            )
+            .order_by(Subscription.id)
+            .limit(batch_size)
+            .all()
+        )
+        if followers:
+            db.execute(
+                insert(Notification),
+                [
+                    {"user_id": subscriber_id, "event_id": event.id, "created_at": event.created_at}
+                    for _, subscriber_id in followers
+                ]
+            )
+            event.fanout_cursor = followers[-1].id
+            notifications_written_total.inc(len(followers))
+        done = len(followers) < batch_size
+
+    if done:
+        event.fanned_out_at = datetime.utcnow()
+    db.commit()
+
+    if done:
+        notification_events_total.labels(fanout=event.fanout).inc()
+        notification_fanout_delay_seconds.observe((event.fanned_out_at - event.created_at).total_seconds())
+    return True
+
+def inbox_page(
+    db: Session,
+    user_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 20
+) -> list[ChannelEvent]:
+    """
+    Newest-first page of the user's notifications.
+
+    Inbox rows written by the worker are merged with pull-mode events of
+    the channels the user followed before the event; both come in
+    (created_at, id) order, so each side needs at most limit + 1 rows.
+    """
+    pushed = (
+        db.query(ChannelEvent)
+        .join(Notification, Notification.event_id == ChannelEvent.id)
+        .filter(Notification.user_id == user_id)
+        .order_by(Notification.created_at.desc(), Notification.event_id.desc())
+    )
+    pulled = (
+        db.query(ChannelEvent)
+        .join(Subscription, and_(
+            Subscription.channel_id == ChannelEvent.channel_id,
+            Subscription.subscriber_id == user_id
+        ))
+        .filter(ChannelEvent.fanout == FANOUT_PULL, ChannelEvent.created_at >= Subscription.created_at)
+        .order_by(ChannelEvent.created_at.desc(), ChannelEvent.id.desc())
+    )
+
+    if cursor:
+        created_at, event_id = decode_cursor(cursor)
+        pushed = pushed.filter(tuple_(Notification.created_at, Notification.event_id) < tuple_(created_at, event_id))
+        pulled = pulled.filter(tuple_(ChannelEvent.created_at, ChannelEvent.id) < tuple_(created_at, event_id))
+
+    channel = joinedload(ChannelEvent.channel, innerjoin=True).load_only(Channel.id, Channel.title, Channel.thumbnail_url)
+    events = pushed.options(channel).limit(limit + 1).all() + pulled.options(channel).limit(limit + 1).all()
+    events.sort(key=lambda event: (event.created_at, event.id), reverse=True)
+
+    if len(events) > limit:
+        events = events[:limit]
+        last = events[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+
+    return events
+
+class NotificationWorker:
+    """
+    Background fan-out of pending channel events.
+
+    Polls every `poll_interval`; wake() starts right away when this
+    process has just recorded an event. Database work runs in a thread so
+    the event loop keeps serving requests.
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = settings.notifications_poll_seconds,
+        batch_size: int = settings.notifications_batch_size
+    ):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._stopped.clear()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Notification worker started")
+
+    async def stop(self) -> None:
+        # Lets a running drain finish its current batch and return
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.drain)
+            except Exception as e:
+                logger.warning(f"Notification fan-out failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def drain(self) -> None:
+        """Fan out batches until no event is pending"""
+        db = SessionLocal()
+        try:
+            while not self._stopped.is_set() and fan_out_batch(db, self.batch_size):
+                pass
+        finally:
+            db.close()
+
+notification_worker = NotificationWorker()
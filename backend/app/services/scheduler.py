@@ -0,0 +1,362 @@
+"""
+Scheduler for time-based jobs: schedule reminders, the daily statistics rollup and trending
+
+One web worker across all replicas leads. It holds a Postgres advisory
+lock on a dedicated connection. If that process dies, the lock goes with
+its connection and another worker takes over within
+SCHEDULER_LEADER_RETRY_SECONDS. PgBouncer in transaction pooling mode
+would keep the lock on a server connection it hands to other clients, so
+with DB_PGBOUNCER=true the lock is taken over SCHEDULER_DATABASE_URL, a
+direct connection; without one every worker leads.
+
+The leader keeps due jobs in a min-heap and sleeps until the earliest
+one, instead of polling tables:
+
+- Reminders are loaded for the next refresh window only, from the
+  partial index on scheduled_at over schedules not yet notified. The
+  window is reloaded every SCHEDULER_REFRESH_SECONDS, and at once when a
+  schedule changes (signalled over pub/sub).
+- The statistics rollup runs right after midnight UTC.
+- The trending ranking is recomputed every TRENDING_REFRESH_SECONDS and
+  published to all workers (app/services/trending.py).
+
+All state lives in the database, so a restarted leader resumes where the
+last one stopped. Each job is also guarded in the database: a reminder is
+claimed with a conditional UPDATE of notified_at, and rollup rows are
+unique per channel and day. So a double leader during failover, or
+SQLite (no advisory locks, every worker leads), cannot repeat work.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy import create_engine, func, insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.core.metrics import scheduler_leader, scheduler_jobs_total
+from app.core.pubsub import pubsub
+from app.models.models import Channel, Schedule, Statistic, Stream, StreamView
+from app.services.notifications import EVENT_SCHEDULE_STARTING, notification_worker, record_channel_event
+from app.services.trending import publish_ranking, trending_engine
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key shared by every worker of every replica
+LEADER_LOCK_KEY = 7_246_301
+
+# Schedule changes are announced here so the leader reloads its window
+SCHEDULER_TOPIC = "scheduler"
+
+# A reminder missed while no leader was running is still sent this late
+MISSED_REMINDER_GRACE = timedelta(minutes=15)
+
+DAILY_ROLLUP_AT = time(0, 5)
+
+JOB_REMINDER = "reminder"
+JOB_ROLLUP = "rollup"
+JOB_TRENDING = "trending"
+
+async def announce_schedules_changed() -> None:
+    """Tell the leader, wherever it runs, to reload upcoming schedules"""
+    await pubsub.publish(SCHEDULER_TOPIC, {"type": "schedules.changed"})
+
+def send_schedule_reminder(db: Session, schedule_id: int) -> bool:
+    """
+    Queue the "starting soon" event for a schedule's followers.
+
+    notified_at is claimed with a conditional UPDATE in the same
+    transaction, so a reminder is sent once even with two leaders; False
+    when it was already sent, the schedule was moved later or the event
+    was not queued.
+    """
+    now = datetime.utcnow()
+    lead = timedelta(seconds=settings.scheduler_reminder_lead_seconds)
+    claimed = db.query(Schedule).filter(
+        Schedule.id == schedule_id,
+        Schedule.notified_at.is_(None),
+        Schedule.scheduled_at <= now + lead
+    ).update({Schedule.notified_at: now}, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        return False
+
+    schedule = db.query(Schedule.channel_id, Schedule.title).filter(Schedule.id == schedule_id).one()
+    event = record_channel_event(db, schedule.channel_id, EVENT_SCHEDULE_STARTING, title=schedule.title, schedule_id=schedule_id)
+    if event is None:
+        # Not queued: release the claim rather than mark a reminder nobody gets
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+def rollup_daily_stats(db: Session, day: date) -> int:
+    """
+    Record a statistics row for `day` for every channel that has none yet.
+
+    Totals are as of the run, computed for all channels at once with
+    grouped queries rather than per channel. Returns the number of rows
+    written.
+    """
+    key = day.isoformat()
+    recorded = {channel_id for (channel_id,) in db.query(Statistic.channel_id).filter(Statistic.date == key)}
+    missing = [channel_id for (channel_id,) in db.query(Channel.id) if channel_id not in recorded]
+    if not missing:
+        return 0
+
+    views = dict(
+        db.query(Stream.channel_id, func.sum(Stream.view_count)).group_by(Stream.channel_id)
+    )
+    viewers = {
+        channel_id: (unique_viewers, avg_watch_time)
+        for channel_id, unique_viewers, avg_watch_time in (
+            db.query(Stream.channel_id, func.count(func.distinct(StreamView.user_id)), func.avg(StreamView.watch_duration))
+            .join(Stream, Stream.id == StreamView.stream_id)
+            .group_by(Stream.channel_id)
+        )
+    }
+
+    rows = []
+    for channel_id in missing:
+        unique_viewers, avg_watch_time = viewers.get(channel_id, (0, None))
+        rows.append({
+            "channel_id": channel_id,
+            "date": key,
+            "total_views": int(views.get(channel_id) or 0),
+            "unique_viewers": int(unique_viewers or 0),
+            "avg_watch_time": float(avg_watch_time or 0.0),
+        })
+
+    db.execute(insert(Statistic), rows)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A channel was recorded meanwhile (the endpoint or another leader)
+        db.rollback()
+        return 0
+
+    logger.info(f"Daily stats rolled up for {len(rows)} channels ({key})")
+    return len(rows)
+
+def _next_rollup_at(now: datetime) -> datetime:
+    run_at = datetime.combine(now.date(), DAILY_ROLLUP_AT)
+    return run_at if run_at > now else run_at + timedelta(days=1)
+
+class Scheduler:
+    """
+    Leader-elected job loop.
+
+    Every worker runs one; all but the leader just retry the advisory
+    lock every `retry_interval`. Database work runs in a thread so the
+    event loop keeps serving requests.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = settings.scheduler_refresh_seconds,
+        retry_interval: float = settings.scheduler_leader_retry_seconds,
+        trending_interval: float = settings.trending_refresh_seconds
+    ):
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.trending_interval = trending_interval
+        # (due_at, seq, job, arg); seq keeps equal due times in insertion order
+        self._heap: list[tuple[datetime, int, str, object]] = []
+        self._seq = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Event] = None
+        # Session-level advisory locks need a connection of their own, outside the pool
+        self._lock_engine = None
+        self._lock_connection = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        if engine.dialect.name == "postgresql" and self._lock_url() is None:
+            logger.warning("Scheduler: DB_PGBOUNCER=true without SCHEDULER_DATABASE_URL, every worker leads")
+        self._changed = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._release_leadership()
+
+    def _lock_url(self) -> Optional[str]:
+        """Where the advisory lock is taken; None when no direct connection is available"""
+        if settings.scheduler_database_url:
+            return settings.scheduler_database_url
+        # Through PgBouncer the lock would outlive this process on a pooled server connection
+        return None if settings.db_pgbouncer else settings.database_url
+
+    def _acquire_leadership(self) -> bool:
+        lock_url = self._lock_url()
+        if engine.dialect.name != "postgresql" or lock_url is None:
+            # No lock: the database guards of each job keep the work single
+            return True
+
+        if self._lock_engine is None:
+            self._lock_engine = create_engine(lock_url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+        connection = self._lock_engine.connect()
+        try:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY}).scalar()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._lock_connection = connection
+        return True
+
+    def _release_leadership(self) -> None:
+        if self._lock_connection is not None:
+            try:
+                # Closing the session releases the lock
+                self._lock_connection.close()
+            except Exception:
+                pass
+            self._lock_connection = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await asyncio.to_thread(self._acquire_leadership):
+                    await self._lead()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Scheduler stepped down: {e}")
+            finally:
+                self._release_leadership()
+            await asyncio.sleep(self.retry_interval)
+
+    async def _lead(self) -> None:
+        logger.info("Scheduler: this worker is the leader")
+        scheduler_leader.inc()
+        listener = asyncio.create_task(self._listen())
+        try:
+            now = datetime.utcnow()
+            self._heap.clear()
+            # Catch up on a rollup missed while no leader was running
+            self._push(now, JOB_ROLLUP, now.date() - timedelta(days=1))
+            trending_engine.reset()
+            self._push(now, JOB_TRENDING, None)
+            refresh_at = now
+
+            while True:
+                if self._changed.is_set() or datetime.utcnow() >= refresh_at:
+                    self._changed.clear()
+                    reminders = await asyncio.to_thread(self._load_reminders)
+                    self._replace_reminders(reminders)
+                    refresh_at = datetime.utcnow() + timedelta(seconds=self.refresh_interval)
+
+                while self._heap and self._heap[0][0] <= datetime.utcnow():
+                    _, _, job, arg = heapq.heappop(self._heap)
+                    if job == JOB_TRENDING:
+                        await self._refresh_trending()
+                    elif await asyncio.to_thread(self._run_job, job, arg):
+                        notification_worker.wake()
+
+                wake_at = min(refresh_at, self._heap[0][0]) if self._heap else refresh_at
+                timeout = max((wake_at - datetime.utcnow()).total_seconds(), 0)
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listener.cancel()
+            trending_engine.deactivate()
+            scheduler_leader.dec()
+
+    async def _listen(self) -> None:
+        try:
+            async with await pubsub.subscribe(SCHEDULER_TOPIC) as subscription:
+                while True:
+                    await subscription.get()
+                    self._changed.set()
+        except Exception as e:
+            # Changes are then picked up at the next refresh
+            logger.warning(f"Scheduler cannot listen for schedule changes: {e}")
+
+    async def _refresh_trending(self) -> None:
+        self._push(datetime.utcnow() + timedelta(seconds=self.trending_interval), JOB_TRENDING, None)
+        try:
+            ranking = await asyncio.to_thread(self._rank_trending)
+        except Exception as e:
+            scheduler_jobs_total.labels(job=JOB_TRENDING, result="error").inc()
+            logger.error(f"Scheduler job {JOB_TRENDING} failed: {e}")
+            return
+        await publish_ranking(ranking)
+        scheduler_jobs_total.labels(job=JOB_TRENDING, result="done").inc()
+
+    def _rank_trending(self) -> list[tuple[int, bool]]:
+        db = SessionLocal()
+        try:
+            return trending_engine.refresh(db)
+        finally:
+            db.close()
+
+    def _push(self, due_at: datetime, job: str, arg) -> None:
+        heapq.heappush(self._heap, (due_at, next(self._seq), job, arg))
+
+    def _load_reminders(self) -> list[tuple[datetime, int]]:
+        """(due_at, schedule_id) of reminders due before the next refresh"""
+        if self._lock_connection is not None:
+            # Fails when the lock session is gone, so the leader steps down
+            self._lock_connection.execute(text("SELECT 1"))
+
+        now = datetime.utcnow()
+        lead = timedelta(seconds=settings.scheduler_reminder_lead_seconds)
+        horizon = now + lead + timedelta(seconds=2 * self.refresh_interval)
+        db = SessionLocal()
+        try:
+            rows = db.query(Schedule.id, Schedule.scheduled_at).filter(
+                Schedule.notified_at.is_(None),
+                Schedule.scheduled_at > now - MISSED_REMINDER_GRACE,
+                Schedule.scheduled_at <= horizon
+            ).all()
+        finally:
+            db.close()
+        return [(scheduled_at - lead, schedule_id) for schedule_id, scheduled_at in rows]
+
+    def _replace_reminders(self, reminders: list[tuple[datetime, int]]) -> None:
+        self._heap = [entry for entry in self._heap if entry[2] != JOB_REMINDER]
+        self._heap.extend((due_at, next(self._seq), JOB_REMINDER, schedule_id) for due_at, schedule_id in reminders)
+        heapq.heapify(self._heap)
+
+    def _run_job(self, job: str, arg) -> bool:
+        """Run one job; True when it queued an event for followers"""
+        db = SessionLocal()
+        try:
+            if job == JOB_REMINDER:
+                sent = send_schedule_reminder(db, arg)
+                scheduler_jobs_total.labels(job=job, result="sent" if sent else "skipped").inc()
+                return sent
+            elif job == JOB_ROLLUP:
+                rollup_daily_stats(db, arg)
+                scheduler_jobs_total.labels(job=job, result="done").inc()
+                now = datetime.utcnow()
+                next_run = _next_rollup_at(now)
+                self._push(next_run, JOB_ROLLUP, next_run.date() - timedelta(days=1))
+        except Exception as e:
+            db.rollback()
+            scheduler_jobs_total.labels(job=job, result="error").inc()
+            logger.error(f"Scheduler job {job}({arg}) failed: {e}")
+            if job == JOB_ROLLUP:
+                # Retry later instead of skipping the day
+                self._push(datetime.utcnow() + timedelta(seconds=self.refresh_interval), JOB_ROLLUP, arg)
+        finally:
+            db.close()
+        return False
+
+scheduler = Scheduler()
@@ -0,0 +1,138 @@
+"""
+Search over streams, channels and users
+
+On Postgres every word of the query becomes a prefix term ("mine craft"
+-> 'mine:* & craft:*'), matched against the GIN indexes on
+search_document() and ranked with ts_rank. Live content and audience
+(view count, current viewers) boost the rank. SQLite, used in
+development, matches with LIKE and ranks by the boosts alone.
+
+Results come in (score, id) descending order; the cursor carries the
+last pair, so the next page continues after it without OFFSET.
+
+Suggestions are prefix matches of channel titles and usernames on
+lower(...) text_pattern_ops indexes.
+"""
+import re
+from typing import Optional
+from fastapi import Response
+from sqlalchemy import Float, case, cast, func, literal_column, or_, tuple_
+from sqlalchemy.orm import Query, Session
+from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_rank_cursor, encode_rank_cursor
+from app.models.models import Channel, Stream, User, search_document
+
+SEARCH_STREAMS = "streams"
+SEARCH_CHANNELS = "channels"
+SEARCH_USERS = "users"
+
+# Words of the query; tsquery operators and punctuation never reach Postgres
+_WORD = re.compile(r"\w+")
+
+def query_terms(q: str) -> list[str]:
+    """Lower-cased words of the query, at most SEARCH_MAX_TERMS of them"""
+    return _WORD.findall(q.lower())[:settings.search_max_terms]
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+# kind -> (model, searched columns, live flag, audience count)
+_TARGETS = {
+    SEARCH_STREAMS: (Stream, (Stream.title, Stream.description), Stream.is_live, Stream.view_count),
+    SEARCH_CHANNELS: (Channel, (Channel.title, Channel.description), Channel.is_live, Channel.viewers_count),
+    SEARCH_USERS: (User, (User.username, User.full_name), None, None),
+}
+
+def search_query(db: Session, kind: str, terms: list[str]) -> tuple[Query, object]:
+    """Matches of `terms` best first, and the score expression the cursor is built on"""
+    model, columns, is_live, audience = _TARGETS[kind]
+    query = db.query(model)
+    if kind == SEARCH_STREAMS:
+        # Live streams and recordings; not streams that never went live
+        query = query.filter(or_(Stream.is_live == True, Stream.is_archived == True))
+    elif kind == SEARCH_USERS:
+        query = query.filter(User.is_active == True)
+
+    live_boost = case((is_live == True, 2.0), else_=1.0) if is_live is not None else None
+    if _is_postgres(db):
+        document = search_document(*columns)
+        tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{term}:*" for term in terms))
+        query = query.filter(document.op("@@")(tsquery))
+        score = func.ts_rank(document, tsquery)
+        if live_boost is not None:
+            # Live counts double; audience adds log10(1 + n)
+            score = score * live_boost * (1 + func.log(1 + func.coalesce(audience, 0)))
+    else:
+        for term in terms:
+            pattern = f"%{_escape_like(term)}%"
+            query = query.filter(or_(*(column.ilike(pattern, escape="\\") for column in columns)))
+        score = live_boost * (1 + func.coalesce(audience, 0)) if live_boost is not None else model.id
+
+    # Double precision, so the score survives the round trip through the cursor
+    # exactly (ts_rank alone is a real, which comes back rounded)
+    score = cast(score, Float)
+    return query.add_columns(score.label("score")).order_by(score.desc(), model.id.desc()), score
+
+def search_page(
+    db: Session,
+    kind: str,
+    q: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 20
+) -> list:
+    """One page of `kind` rows matching `q`; the next page token goes to X-Next-Cursor"""
+    terms = query_terms(q)
+    if not terms:
+        return []
+
+    query, score = search_query(db, kind, terms)
+    model = _TARGETS[kind][0]
+    if cursor:
+        last_score, row_id = decode_rank_cursor(cursor)
+        query = query.filter(tuple_(score, model.id) < tuple_(last_score, row_id))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, last_score = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_rank_cursor(last_score, last.id)
+
+    return [row for row, _ in rows]
+
+def suggest(db: Session, q: str, limit: int = 10) -> list[dict]:
+    """Channel titles and usernames starting with `q`, live and watched channels first"""
+    prefix = q.strip().lower()
+    if not prefix:
+        return []
+    pattern = f"{_escape_like(prefix)}%"
+
+    channels = (
+        db.query(Channel.id, Channel.title, Channel.thumbnail_url, Channel.is_live)
+        .filter(func.lower(Channel.title).like(pattern, escape="\\"))
+        .order_by(Channel.is_live.desc(), Channel.viewers_count.desc(), Channel.id)
+        .limit(limit)
+        .all()
+    )
+    users = (
+        db.query(User.id, User.username, User.avatar_url)
+        .filter(func.lower(User.username).like(pattern, escape="\\"), User.is_active == True)
+        .order_by(func.length(User.username), User.id)
+        .limit(limit)
+        .all()
+    )
+
+    # Channels keep at least half of the slots, users fill the rest
+    channels = channels[:max(limit - len(users), limit - limit // 2)]
+    users = users[:limit - len(channels)]
+    return [
+        {"type": "channel", "id": channel.id, "text": channel.title, "image_url": channel.thumbnail_url, "is_live": channel.is_live}
+        for channel in channels
+    ] + [
+        {"type": "user", "id": user.id, "text": user.username, "image_url": user.avatar_url, "is_live": False}
+        for user in users
+    ]
@@ -0,0 +1,235 @@
+"""
+Trending streams: time-decayed popularity, ranked in the background
+
+The scheduler leader (app/services/scheduler.py) owns TrendingEngine and
+refreshes it every TRENDING_REFRESH_SECONDS:
+
+- views: every view adds 1 to its stream's score, halving every
+  TRENDING_HALF_LIFE_SECONDS. Each refresh decays the scores and adds
+  only the stream_views rows inserted since the previous one (a range on
+  the primary key), so the cost does not grow with history. A new leader
+  starts from time buckets of the last few half-lives.
+- chat: every worker counts the chat messages it relays and reports them
+  on the "trending" topic; the leader decays them like views.
+- viewers: current viewers of live channels, as stored on the channel.
+
+The top TRENDING_SIZE streams are published on the same topic, and every
+worker keeps the latest ranking in TrendingBoard, so the home page reads
+a slice of a list held in memory instead of sorting streams per request.
+"""
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.pubsub import pubsub
+from app.models.models import Channel, Stream, StreamView
+
+logger = logging.getLogger(__name__)
+
+TRENDING_TOPIC = "trending"
+
+# Score of one view, one chat message and one current viewer
+VIEW_WEIGHT = 1.0
+CHAT_WEIGHT = 0.5
+VIEWER_WEIGHT = 1.0
+
+# A new leader rebuilds view scores from this many buckets of half a half-life each
+BOOTSTRAP_BUCKETS = 8
+
+# Decayed scores below this are forgotten
+MIN_SCORE = 0.01
+
+class TrendingEngine:
+    """Decayed view and chat scores; used by the scheduler leader only"""
+
+    def __init__(self, half_life: float = settings.trending_half_life_seconds, size: int = settings.trending_size):
+        self.half_life = half_life
+        self.size = size
+        self.active = False
+        self._views: dict[int, float] = {}
+        self._chat: dict[int, float] = {}
+        self._last_view_id: Optional[int] = None
+        self._refreshed_at: Optional[datetime] = None
+        # Chat reports arrive on the event loop while refresh runs in a thread;
+        # view scores are only touched by refresh
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Start over, as a new leader"""
+        self._views.clear()
+        self._last_view_id = None
+        self._refreshed_at = None
+        with self._lock:
+            self._chat.clear()
+        self.active = True
+
+    def deactivate(self) -> None:
+        self.active = False
+
+    def add_chat(self, counts: dict) -> None:
+        """Chat messages per channel id, as reported by a worker"""
+        if not self.active:
+            return
+        with self._lock:
+            for channel_id, count in counts.items():
+                channel_id = int(channel_id)
+                self._chat[channel_id] = self._chat.get(channel_id, 0.0) + float(count)
+
+    def _decay(self, scores: dict[int, float], factor: float) -> None:
+        for key in list(scores):
+            scores[key] *= factor
+            if scores[key] < MIN_SCORE:
+                del scores[key]
+
+    def _bootstrap_views(self, db: Session, now: datetime) -> None:
+        # Read first: a view inserted meanwhile is then counted twice rather than lost
+        last_view_id = db.query(func.max(StreamView.id)).scalar() or 0
+        bucket = timedelta(seconds=self.half_life / 2)
+        views: dict[int, float] = {}
+        for k in range(BOOTSTRAP_BUCKETS):
+            # Views of a bucket count as of its middle
+            weight = 0.5 ** ((k + 0.5) / 2)
+            rows = db.query(StreamView.stream_id, func.count(StreamView.id)).filter(
+                StreamView.started_at >= now - (k + 1) * bucket,
+                StreamView.started_at < now - k * bucket
+            ).group_by(StreamView.stream_id)
+            for stream_id, count in rows:
+                views[stream_id] = views.get(stream_id, 0.0) + count * weight
+        self._views, self._last_view_id = views, last_view_id
+
+    def _new_views(self, db: Session) -> list:
+        """(stream_id, count, last id) of the views inserted since the last refresh"""
+        # A view committed after a later id was read is missed; fine for a popularity signal
+        return db.query(StreamView.stream_id, func.count(StreamView.id), func.max(StreamView.id)).filter(
+            StreamView.id > self._last_view_id
+        ).group_by(StreamView.stream_id).all()
+
+    def refresh(self, db: Session) -> list[tuple[int, bool]]:
+        """Update the scores and return the top streams as (stream_id, is_live), best first"""
+        now = datetime.utcnow()
+        factor = 1.0
+        if self._refreshed_at is None:
+            self._bootstrap_views(db, now)
+        else:
+            new_views = self._new_views(db)
+            factor = 0.5 ** ((now - self._refreshed_at).total_seconds() / self.half_life)
+            self._decay(self._views, factor)
+            for stream_id, count, last_id in new_views:
+                self._views[stream_id] = self._views.get(stream_id, 0.0) + count
+                self._last_view_id = max(self._last_view_id, last_id)
+        self._refreshed_at = now
+        with self._lock:
+            self._decay(self._chat, factor)
+            chat = dict(self._chat)
+
+        # Live streams always compete; chat and viewers count for them only
+        scores = dict(self._views)
+        live = set()
+        for stream_id, channel_id, viewers in (
+            db.query(Stream.id, Stream.channel_id, Channel.viewers_count)
+            .join(Channel, Channel.id == Stream.channel_id)
+            .filter(Stream.is_live == True)
+        ):
+            live.add(stream_id)
+            scores[stream_id] = (
+                VIEW_WEIGHT * scores.get(stream_id, 0.0)
+                + CHAT_WEIGHT * chat.get(channel_id, 0.0)
+                + VIEWER_WEIGHT * (viewers or 0)
+            )
+
+        # Recordings qualify once archived; streams that never went live or were deleted drop out
+        candidates = sorted(scores, key=lambda stream_id: (scores[stream_id], stream_id), reverse=True)[:2 * self.size]
+        recorded = {
+            stream_id for (stream_id,) in
+            db.query(Stream.id).filter(Stream.id.in_([s for s in candidates if s not in live]), Stream.is_archived == True)
+        }
+        ranking = [(stream_id, stream_id in live) for stream_id in candidates if stream_id in live or stream_id in recorded]
+        return ranking[:self.size]
+
+async def publish_ranking(ranking: list[tuple[int, bool]]) -> None:
+    await pubsub.publish(TRENDING_TOPIC, {
+        "type": "ranking",
+        "streams": [[stream_id, is_live] for stream_id, is_live in ranking],
+    })
+
+class TrendingBoard:
+    """
+    This worker's copy of the latest ranking, and its unreported chat activity.
+
+    Runs in every web worker: listens on the trending topic and reports
+    chat counts every `report_interval`.
+    """
+
+    def __init__(self, engine: TrendingEngine, report_interval: float = settings.trending_refresh_seconds):
+        self.engine = engine
+        self.report_interval = report_interval
+        self._streams: Optional[list[int]] = None
+        self._live: Optional[list[int]] = None
+        self._chat: Counter = Counter()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._listen()), loop.create_task(self._report())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def record_chat(self, channel_id: int) -> None:
+        self._chat[channel_id] += 1
+
+    def top(self, live_only: bool = False, skip: int = 0, limit: int = 20) -> Optional[list[int]]:
+        """Stream ids of one page of the ranking; None until a ranking has arrived"""
+        ranking = self._live if live_only else self._streams
+        if ranking is None:
+            return None
+        return ranking[skip:skip + limit]
+
+    def _apply(self, event: dict) -> None:
+        if event.get("type") == "ranking":
+            streams = event["streams"]
+            # Swapped whole, so readers never see a half-updated ranking
+            self._streams = [stream_id for stream_id, _ in streams]
+            self._live = [stream_id for stream_id, is_live in streams if is_live]
+        elif event.get("type") == "chat":
+            self.engine.add_chat(event["channels"])
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with await pubsub.subscribe(TRENDING_TOPIC) as subscription:
+                    while True:
+                        self._apply(await subscription.get())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Trending board cannot listen for rankings: {e}")
+                await asyncio.sleep(self.report_interval)
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            if not self._chat:
+                continue
+            counts, self._chat = self._chat, Counter()
+            await pubsub.publish(TRENDING_TOPIC, {
+                "type": "chat",
+                "channels": {str(channel_id): count for channel_id, count in counts.items()},
+            })
+
+trending_engine = TrendingEngine()
+trending_board = TrendingBoard(trending_engine)
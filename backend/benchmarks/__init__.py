@@ -0,0 +1,3 @@
+"""
+Reproducible benchmark and load-test harness for the API and chat
+"""
@@ -0,0 +1,376 @@
+"""
+Chat WebSocket soak and fan-out benchmark
+
+Opens thousands of passive viewer connections to
+/api/streams/ws/{stream_key}/chat spread over several rooms, then injects
+numbered messages into each room at a fixed rate and measures:
+
+- end-to-end delivery latency (sender timestamp -> viewer receive)
+- dropped frames (messages a connected viewer never received)
+- server memory per connection (RSS growth from idle to fully connected)
+- server CPU per delivered message (utime + stime over the injection window)
+
+Viewers run in several client processes so the load generator is not the
+bottleneck. Resource figures are read from /proc, so they need Linux and
+a server on the same host (started here, or given with --server-pid).
+
+Usage:
+    python -m benchmarks.chat_soak --viewers 2000 --rooms 5 --rate 5 --duration 60
+    python -m benchmarks.chat_soak --base-url http://localhost:8000 --server-pid 1234 ...
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import signal
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import websockets
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.run import git_info, start_server, wait_until_up
+
+# Latencies are bucketed at 0.1 ms so millions of deliveries merge cheaply
+LATENCY_RESOLUTION_MS = 0.1
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+def raise_fd_limit() -> int:
+    """Thousands of sockets need more than the usual 1024 descriptors"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+def child_pids(parent_pid: int) -> list[int]:
+    pids = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        if int(stat.rsplit(")", 1)[1].split()[1]) == parent_pid:
+            pids.append(int(entry.name))
+    return pids
+
+def process_usage(pids: list[int]) -> tuple[int, float]:
+    """(resident bytes, cpu seconds) summed over `pids`"""
+    rss = 0
+    cpu = 0.0
+    for pid in pids:
+        try:
+            fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+            statm = Path(f"/proc/{pid}/statm").read_text().split()
+        except OSError:
+            continue
+        # utime and stime are fields 14 and 15 of stat; resident pages are statm[1]
+        cpu += (int(fields[11]) + int(fields[12])) / CLK_TCK
+        rss += int(statm[1]) * resource.getpagesize()
+    return rss, cpu
+
+def latency_percentiles(buckets: Counter) -> dict:
+    total = sum(buckets.values())
+    result = {"p50": None, "p90": None, "p99": None, "p999": None, "max": None}
+    if not total:
+        return result
+    targets = [("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999)]
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        while targets and seen >= targets[0][1] * total:
+            result[targets.pop(0)[0]] = round(bucket * LATENCY_RESOLUTION_MS, 1)
+    result["max"] = round(max(buckets) * LATENCY_RESOLUTION_MS, 1)
+    return result
+
+async def scrape_chat_metrics(base_url: str) -> dict:
+    values: dict = Counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        text = (await client.get("/metrics")).text
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name in ("chat_deliveries_total", "chat_messages_total", "chat_connections_gauge"):
+                key = sample.name + (f":{sample.labels['result']}" if "result" in sample.labels else "")
+                values[key] += sample.value
+            elif sample.name in ("chat_broadcast_seconds_sum", "chat_broadcast_seconds_count"):
+                values[sample.name] += sample.value
+    return values
+
+# Viewer processes
+
+async def _viewers(ws_base: str, assignments: list[tuple[str, int]], ramp_per_second: float, control, results) -> None:
+    latency = Counter()
+    received: Counter = Counter()
+    connected: Counter = Counter()
+    connect_errors = 0
+    disconnects = 0
+    sockets = []
+
+    async def viewer(key: str, ws) -> None:
+        nonlocal disconnects
+        try:
+            async for raw in ws:
+                # "soak:<measured>:<seq>:<unix time at send>"
+                parts = json.loads(raw).get("text", "").split(":")
+                if len(parts) != 4 or parts[0] != "soak" or parts[1] != "1":
+                    continue
+                received[key] += 1
+                latency[int((time.time() - float(parts[3])) * 1000 / LATENCY_RESOLUTION_MS)] += 1
+        except websockets.ConnectionClosed:
+            pass
+        except asyncio.CancelledError:
+            return
+        if not stopping.is_set():
+            disconnects += 1
+
+    stopping = asyncio.Event()
+    readers = []
+    for key, _ in assignments:
+        started = time.perf_counter()
+        try:
+            ws = await websockets.connect(f"{ws_base}/api/streams/ws/{key}/chat", max_queue=None, open_timeout=60)
+        except (OSError, asyncio.TimeoutError, websockets.WebSocketException):
+            connect_errors += 1
+            continue
+        sockets.append(ws)
+        connected[key] += 1
+        readers.append(asyncio.create_task(viewer(key, ws)))
+        await asyncio.sleep(max(0.0, 1 / ramp_per_second - (time.perf_counter() - started)))
+
+    results.put(("connected", os.getpid(), sum(connected.values()), connect_errors))
+    # Wait for the coordinator without blocking the loop that reads frames
+    await asyncio.get_running_loop().run_in_executor(None, control.wait)
+    stopping.set()
+    for task in readers:
+        task.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+
+    results.put(("done", os.getpid(), {
+        "latency": dict(latency),
+        "received": dict(received),
+        "connected": dict(connected),
+        "connect_errors": connect_errors,
+        "disconnects": disconnects,
+        "cpu_seconds": time.process_time(),
+    }))
+
+def viewer_process(ws_base: str, assignments: list, ramp_per_second: float, control, results) -> None:
+    raise_fd_limit()
+    asyncio.run(_viewers(ws_base, assignments, ramp_per_second, control, results))
+
+# Injection
+
+async def inject(ws_base: str, keys: list[str], rate: float, warmup: float, duration: float) -> tuple[dict, float]:
+    """Send `rate` numbered messages per second into every room; returns measured sends per room"""
+    sent = Counter()
+    deadline = time.perf_counter() + warmup + duration
+    measure_from = time.perf_counter() + warmup
+
+    async def sender(key: str) -> None:
+        async with websockets.connect(f"{ws_base}/api/streams/ws/{key}/chat", max_queue=None) as ws:
+            # Our own broadcasts come back too; keep reading so the server never blocks on us
+            drain = asyncio.create_task(_discard(ws))
+            next_send = time.perf_counter() + random.random() / rate
+            seq = 0
+            while next_send < deadline:
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+                measured = int(time.perf_counter() >= measure_from)
+                seq += 1
+                sent[key] += measured
+                await ws.send(json.dumps({"text": f"soak:{measured}:{seq}:{time.time()!r}", "username": "soak"}))
+                next_send += 1 / rate
+            drain.cancel()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender(key) for key in keys))
+    return dict(sent), time.perf_counter() - started
+
+async def _discard(ws) -> None:
+    try:
+        async for _ in ws:
+            pass
+    except websockets.ConnectionClosed:
+        pass
+
+# Coordinator
+
+def main() -> int:
+    from benchmarks.seed import SCALES
+
+    parser = argparse.ArgumentParser(description="Chat WebSocket soak / fan-out benchmark")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="tiny")
+    parser.add_argument("--no-seed", action="store_true", help="rooms bench-key-1..N already exist")
+    parser.add_argument("--base-url", help="soak a running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, action="append", default=[],
+                        help="pid of a running server process to sample (repeatable)")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers; 1 measures a single ConnectionManager")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--viewers", type=int, default=1000, help="total viewers across all rooms")
+    parser.add_argument("--rate", type=float, default=2.0, help="messages per second injected into each room")
+    parser.add_argument("--ramp", type=float, default=500, help="new connections per second across all clients")
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--drain", type=float, default=5, help="seconds to wait for in-flight messages")
+    parser.add_argument("--client-processes", type=int, default=max(1, min(8, (os.cpu_count() or 2) - 1)))
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    fd_limit = raise_fd_limit()
+    if not args.database_url and not args.base_url:
+        args.database_url = f"sqlite:///{tempfile.mkdtemp(prefix='xatube-soak-db-')}/soak.db"
+
+    if not args.no_seed:
+        from sqlalchemy import create_engine
+        from benchmarks.seed import seed
+
+        engine = create_engine(args.database_url)
+        channel_ids = seed(engine, args.scale).channel_ids
+        engine.dispose()
+        if len(channel_ids) < args.rooms:
+            raise SystemExit(f"scale {args.scale} has only {len(channel_ids)} channels for {args.rooms} rooms")
+    keys = [f"bench-key-{i}" for i in range(1, args.rooms + 1)]
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server, base_url = start_server(args.database_url, args.workers, args.port)
+    ws_base = base_url.replace("http://", "ws://", 1).replace("https://", "wss://", 1)
+
+    # Round-robin viewers over rooms, then deal them out to client processes
+    assignments = [(keys[i % len(keys)], i) for i in range(args.viewers)]
+    shards = [assignments[n::args.client_processes] for n in range(args.client_processes)]
+    ctx = multiprocessing.get_context("spawn")
+    control = ctx.Event()
+    results = ctx.Queue()
+    clients = []
+
+    try:
+        wait_until_up(base_url)
+        server_pids = args.server_pid or (child_pids(server.pid) if server else [])
+        idle_rss, _ = process_usage(server_pids)
+        metrics_before = asyncio.run(scrape_chat_metrics(base_url))
+
+        connect_started = time.perf_counter()
+        for shard in shards:
+            process = ctx.Process(
+                target=viewer_process,
+                args=(ws_base, shard, args.ramp / args.client_processes, control, results),
+                daemon=True,
+            )
+            process.start()
+            clients.append(process)
+
+        connected = connect_errors = 0
+        for _ in clients:
+            _, _, ok, failed = results.get(timeout=args.viewers / args.ramp * 4 + 120)
+            connected += ok
+            connect_errors += failed
+        connect_seconds = time.perf_counter() - connect_started
+        print(f"{connected} viewers connected in {connect_seconds:.1f}s ({connect_errors} failed)", file=sys.stderr)
+
+        time.sleep(1)
+        connected_rss, cpu_before = process_usage(server_pids)
+        sent, inject_seconds = asyncio.run(inject(ws_base, keys, args.rate, args.warmup, args.duration))
+        time.sleep(args.drain)
+        _, cpu_after = process_usage(server_pids)
+        metrics_after = asyncio.run(scrape_chat_metrics(base_url))
+
+        control.set()
+        shard_results = [results.get(timeout=120)[2] for _ in clients]
+    finally:
+        control.set()
+        for process in clients:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+
+    latency = Counter()
+    received = Counter()
+    viewers_per_room = Counter()
+    for shard in shard_results:
+        latency.update({int(bucket): count for bucket, count in shard["latency"].items()})
+        received.update(shard["received"])
+        viewers_per_room.update(shard["connected"])
+
+    expected = sum(sent.get(key, 0) * viewers_per_room[key] for key in keys)
+    delivered = sum(received.values())
+    measured_seconds = inject_seconds - args.warmup
+    server_cpu = cpu_after - cpu_before if server_pids else None
+    server_deliveries = metrics_after["chat_deliveries_total:ok"] - metrics_before["chat_deliveries_total:ok"]
+    broadcasts = metrics_after["chat_broadcast_seconds_count"] - metrics_before["chat_broadcast_seconds_count"]
+    broadcast_time = metrics_after["chat_broadcast_seconds_sum"] - metrics_before["chat_broadcast_seconds_sum"]
+
+    report = {
+        "benchmark": "xatube-chat-soak",
+        "version": 1,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_info(),
+        "config": {
+            "rooms": len(keys),
+            "viewers": args.viewers,
+            "rate_per_room": args.rate,
+            "warmup_seconds": args.warmup,
+            "duration_seconds": args.duration,
+            "workers": None if args.base_url else args.workers,
+            "client_processes": args.client_processes,
+            "fd_limit": fd_limit,
+        },
+        "connections": {
+            "connected": connected,
+            "connect_errors": connect_errors,
+            "connect_seconds": round(connect_seconds, 2),
+            "disconnects": sum(shard["disconnects"] for shard in shard_results),
+        },
+        "delivery": {
+            "messages_sent": sum(sent.values()),
+            "deliveries_expected": expected,
+            "deliveries_received": delivered,
+            "dropped": expected - delivered,
+            "drop_ratio": round(1 - delivered / expected, 6) if expected else None,
+            "deliveries_per_second": round(delivered / measured_seconds, 1) if measured_seconds > 0 else None,
+            "latency_ms": latency_percentiles(latency),
+        },
+        "server": {
+            "pids": server_pids,
+            "idle_rss_mb": round(idle_rss / 2**20, 1) if server_pids else None,
+            "connected_rss_mb": round(connected_rss / 2**20, 1) if server_pids else None,
+            "rss_kb_per_connection": round((connected_rss - idle_rss) / 1024 / connected, 2)
+                if server_pids and connected else None,
+            "cpu_seconds": round(server_cpu, 3) if server_cpu is not None else None,
+            # Includes warmup sends, so divide by everything the server fanned out
+            "cpu_us_per_delivery": round(server_cpu / server_deliveries * 1e6, 2)
+                if server_cpu is not None and server_deliveries else None,
+            "broadcasts": int(broadcasts),
+            "avg_broadcast_ms": round(broadcast_time / broadcasts * 1000, 3) if broadcasts else None,
+        },
+        "clients": {
+            # Near 100% of a core per process means the clients, not the server, were the limit
+            "cpu_seconds": round(sum(shard["cpu_seconds"] for shard in shard_results), 2),
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        print(f"report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
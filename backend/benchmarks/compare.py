@@ -0,0 +1,91 @@
+"""
+Compare two benchmark reports and flag regressions
+
+Throughput and latency depend on the machine, so they are only flagged when
+they move by more than --threshold. SQL statements per request do not, and
+any increase is reported as a regression.
+
+Usage:
+    python -m benchmarks.compare baseline.json current.json [--threshold 0.15]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# (path in the scenario result, label, True if bigger is better)
+CHECKS = (
+    (("throughput_rps",), "throughput rps", True),
+    (("throughput_deliveries_per_second",), "deliveries/s", True),
+    (("latency_ms", "p50"), "p50 ms", False),
+    (("latency_ms", "p99"), "p99 ms", False),
+    (("delivery_ratio",), "delivery ratio", True),
+)
+QUERY_TOLERANCE = 0.01
+
+def lookup(result: dict, path: tuple):
+    for key in path:
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+def compare(baseline: dict, current: dict, threshold: float) -> tuple[list[str], list[str]]:
+    """Returns (table lines, regression messages)"""
+    lines = [f"{'scenario':<15} {'metric':<16} {'baseline':>12} {'current':>12} {'change':>9}"]
+    regressions = []
+
+    for scenario, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(scenario)
+        if before is None:
+            lines.append(f"{scenario:<15} (new scenario)")
+            continue
+
+        for path, label, higher_is_better in CHECKS:
+            old, new = lookup(before, path), lookup(now, path)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            lines.append(f"{scenario:<15} {label:<16} {old:>12.2f} {new:>12.2f} {change:>+8.1%}")
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(f"{scenario}: {label} {old:.2f} -> {new:.2f} ({change:+.1%})")
+
+        old, new = before.get("queries_per_request"), now.get("queries_per_request")
+        if old is not None and new is not None:
+            lines.append(f"{scenario:<15} {'queries/request':<16} {old:>12.2f} {new:>12.2f} {new - old:>+9.2f}")
+            if new - old > QUERY_TOLERANCE:
+                regressions.append(f"{scenario}: queries per request {old:.2f} -> {new:.2f}")
+
+        if now.get("errors") or now.get("client_errors"):
+            regressions.append(f"{scenario}: {now.get('errors') or now.get('client_errors')} failed requests")
+
+    return lines, regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    for section, key in (("config", "scale"), ("config", "workers"), ("config", "concurrency"), ("environment", "database")):
+        if baseline.get(section, {}).get(key) != current.get(section, {}).get(key):
+            print(f"warning: reports differ in {key}, timings are not comparable", file=sys.stderr)
+
+    print(f"baseline {baseline['git'].get('commit')}  current {current['git'].get('commit')}")
+    lines, regressions = compare(baseline, current, args.threshold)
+    print("\n".join(lines))
+
+    if regressions:
+        print("\nRegressions:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,480 @@
+"""
+API and chat load benchmark
+
+Seeds a database, starts the API under gunicorn (or targets a running
+server), and drives each scenario with concurrent clients for a fixed
+duration. Throughput, latency percentiles and SQL statements per request
+(from the server's db_queries_per_request histogram) are written as JSON
+together with the git commit, so runs can be compared across commits with
+benchmarks/compare.py.
+
+Usage:
+    python -m benchmarks.run --scale small --duration 20 --output bench.json
+    python -m benchmarks.run --base-url http://localhost:8000 --no-seed ...
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+import websockets
+from prometheus_client.parser import text_string_to_metric_families
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+HTTP_SCENARIOS = ("streams_list", "stream_detail", "comments", "subscriptions")
+SCENARIOS = HTTP_SCENARIOS + ("chat",)
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, q in [0, 100]"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def latency_summary(seconds: list[float]) -> dict:
+    return {
+        name: round(value * 1000, 3) if value is not None else None
+        for name, value in (
+            ("p50", percentile(seconds, 50)),
+            ("p90", percentile(seconds, 90)),
+            ("p99", percentile(seconds, 99)),
+            ("max", max(seconds) if seconds else None),
+        )
+    }
+
+def git_info() -> dict:
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=30
+            ).stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            return ""
+    return {
+        "commit": git("rev-parse", "HEAD") or None,
+        "branch": git("rev-parse", "--abbrev-ref", "HEAD") or None,
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+async def scrape_query_stats(client: httpx.AsyncClient) -> dict:
+    """(method, endpoint) -> [statement sum, db seconds sum, request count]"""
+    response = await client.get("/metrics")
+    stats: dict = defaultdict(lambda: [0.0, 0.0, 0.0])
+    for family in text_string_to_metric_families(response.text):
+        if family.name not in ("db_queries_per_request", "db_time_per_request_seconds"):
+            continue
+        for sample in family.samples:
+            key = (sample.labels.get("method"), sample.labels.get("endpoint"))
+            if sample.name == "db_queries_per_request_sum":
+                stats[key][0] += sample.value
+            elif sample.name == "db_time_per_request_seconds_sum":
+                stats[key][1] += sample.value
+            elif sample.name == "db_queries_per_request_count":
+                stats[key][2] += sample.value
+    return stats
+
+def query_stats_delta(before: dict, after: dict) -> dict:
+    """Average SQL statements and DB time per request between two scrapes"""
+    endpoints = {}
+    total_queries = total_db_time = total_requests = 0.0
+    for key, (queries, db_time, count) in after.items():
+        if key[1] == "/metrics":
+            continue
+        prev = before.get(key, (0.0, 0.0, 0.0))
+        requests = count - prev[2]
+        if requests <= 0:
+            continue
+        queries -= prev[0]
+        db_time -= prev[1]
+        endpoints[f"{key[0]} {key[1]}"] = {
+            "requests": int(requests),
+            "queries_per_request": round(queries / requests, 3),
+            "db_time_ms_per_request": round(db_time / requests * 1000, 3),
+        }
+        total_queries += queries
+        total_db_time += db_time
+        total_requests += requests
+    return {
+        "queries_per_request": round(total_queries / total_requests, 3) if total_requests else None,
+        "db_time_ms_per_request": round(total_db_time / total_requests * 1000, 3) if total_requests else None,
+        "endpoints": endpoints,
+    }
+
+class LoadContext:
+    """Benchmark inputs shared by every scenario"""
+
+    def __init__(self, base_url: str, dataset: dict, concurrency: int, duration: float, warmup: float, rng_seed: int):
+        self.base_url = base_url
+        self.dataset = dataset
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.rng_seed = rng_seed
+
+    def zipf_choice(self, rng: random.Random, items: list):
+        """Pick with a heavy head, like real traffic (items are ordered hot first)"""
+        index = min(int(rng.paretovariate(1.2)) - 1, len(items) - 1)
+        return items[index]
+
+RequestFactory = Callable[[random.Random], str]
+
+def streams_list_paths(ctx: LoadContext) -> RequestFactory:
+    channels = ctx.dataset["channel_ids"]
+    def make(rng: random.Random) -> str:
+        roll = rng.random()
+        if roll < 0.3:
+            return "/api/streams?limit=20"
+        if roll < 0.5:
+            return "/api/streams/trending?limit=20"
+        if roll < 0.8:
+            return "/api/streams?is_live=false&limit=20"
+        return f"/api/streams?channel_id={ctx.zipf_choice(rng, channels)}&is_live=false&limit=20"
+    return make
+
+def stream_detail_paths(ctx: LoadContext) -> RequestFactory:
+    streams = ctx.dataset["commented_stream_ids"] or ctx.dataset["stream_ids"]
+    return lambda rng: f"/api/streams/{ctx.zipf_choice(rng, streams)}"
+
+def comments_paths(ctx: LoadContext) -> RequestFactory:
+    streams = ctx.dataset["commented_stream_ids"] or ctx.dataset["stream_ids"]
+    return lambda rng: f"/api/videos/{ctx.zipf_choice(rng, streams)}/comments?limit=50"
+
+def subscriptions_paths(ctx: LoadContext) -> RequestFactory:
+    channels = ctx.dataset["channel_ids"]
+    def make(rng: random.Random) -> str:
+        roll = rng.random()
+        if roll < 0.25:
+            return "/api/subscriptions/user/subscriptions"
+        if roll < 0.5:
+            return "/api/subscriptions/feed"
+        if roll < 0.75:
+            # A page of creator cards
+            ids = {ctx.zipf_choice(rng, channels) for _ in range(20)}
+            return "/api/subscriptions/state?" + "&".join(f"channel_ids={channel_id}" for channel_id in ids)
+        return f"/api/subscriptions/{ctx.zipf_choice(rng, channels)}/is-subscribed"
+    return make
+
+PATH_FACTORIES: dict[str, Callable[[LoadContext], RequestFactory]] = {
+    "streams_list": streams_list_paths,
+    "stream_detail": stream_detail_paths,
+    "comments": comments_paths,
+    "subscriptions": subscriptions_paths,
+}
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> None:
+    response = await client.post("/api/auth/login", params={"username": username, "password": password})
+    response.raise_for_status()
+
+async def run_http_scenario(ctx: LoadContext, name: str, password: str) -> dict:
+    make_path = PATH_FACTORIES[name](ctx)
+    usernames = ctx.dataset["usernames"]
+    clients = [
+        httpx.AsyncClient(base_url=ctx.base_url, timeout=30) for _ in range(ctx.concurrency)
+    ]
+    try:
+        # Every virtual user has its own session; logins happen before measuring
+        await asyncio.gather(*(
+            login(client, usernames[i % len(usernames)], password) for i, client in enumerate(clients)
+        ))
+
+        async def drive(client: httpx.AsyncClient, rng: random.Random, until: float, latencies: list, errors: list):
+            while time.perf_counter() < until:
+                path = make_path(rng)
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    outcome = response.status_code
+                except httpx.HTTPError as exc:
+                    outcome = type(exc).__name__
+                latencies.append(time.perf_counter() - started)
+                if not isinstance(outcome, int) or outcome >= 400:
+                    errors.append(str(outcome))
+
+        async def phase(seconds: float) -> tuple[list, list, float]:
+            latencies: list = []
+            errors: list = []
+            started = time.perf_counter()
+            until = started + seconds
+            await asyncio.gather(*(
+                drive(client, random.Random(f"{ctx.rng_seed}:{name}:{i}"), until, latencies, errors)
+                for i, client in enumerate(clients)
+            ))
+            return latencies, errors, time.perf_counter() - started
+
+        if ctx.warmup > 0:
+            await phase(ctx.warmup)
+
+        metrics_client = clients[0]
+        before = await scrape_query_stats(metrics_client)
+        latencies, errors, elapsed = await phase(ctx.duration)
+        after = await scrape_query_stats(metrics_client)
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "errors_by_status": dict(Counter(errors)),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": latency_summary(latencies),
+        **query_stats_delta(before, after),
+    }
+
+async def run_chat_scenario(ctx: LoadContext, rooms: int, message_rate: float) -> dict:
+    """
+    Fan-out test: `concurrency` clients per room, each sending `message_rate`
+    messages per second. Every client measures how long each broadcast took
+    to reach it.
+    """
+    keys = ctx.dataset["live_stream_keys"][:rooms] or ctx.dataset["live_stream_keys"]
+    ws_base = ctx.base_url.replace("http://", "ws://", 1).replace("https://", "wss://", 1)
+    latencies: list[float] = []
+    sent = 0
+    received = 0
+    measuring = False
+
+    async def client(key: str, index: int):
+        nonlocal sent
+        rng = random.Random(f"{ctx.rng_seed}:chat:{key}:{index}")
+        async with websockets.connect(f"{ws_base}/api/streams/ws/{key}/chat", max_queue=None) as ws:
+            async def reader():
+                nonlocal received
+                async for raw in ws:
+                    # "bench:<measured>:<sender>@<perf_counter at send>"
+                    header, _, sent_at = json.loads(raw).get("text", "").partition("@")
+                    if header.startswith("bench:1:"):
+                        latencies.append(time.perf_counter() - float(sent_at))
+                        received += 1
+
+            reader_task = asyncio.create_task(reader())
+            # Nobody sends until every client has joined its room
+            joined.append(index)
+            if len(joined) == len(tasks):
+                all_joined.set()
+            await all_joined.wait()
+            try:
+                # Stagger senders so messages do not arrive in lockstep
+                await asyncio.sleep(rng.random() / message_rate)
+                while not stopped.is_set():
+                    flag = int(measuring)
+                    sent += flag
+                    await ws.send(json.dumps({
+                        "text": f"bench:{flag}:{index}@{time.perf_counter()!r}",
+                        "username": f"bench_{index}",
+                    }))
+                    try:
+                        await asyncio.wait_for(stopped.wait(), timeout=1 / message_rate)
+                    except asyncio.TimeoutError:
+                        pass
+                # Let in-flight broadcasts land before closing
+                await asyncio.sleep(2)
+            finally:
+                reader_task.cancel()
+
+    joined: list[int] = []
+    all_joined = asyncio.Event()
+    stopped = asyncio.Event()
+    tasks = [
+        asyncio.create_task(client(key, i))
+        for key in keys for i in range(ctx.concurrency)
+    ]
+    await asyncio.wait_for(all_joined.wait(), timeout=60)
+    await asyncio.sleep(ctx.warmup)
+    measuring = True
+    measure_started = time.perf_counter()
+    await asyncio.sleep(ctx.duration)
+    measuring = False
+    stopped.set()
+    elapsed = time.perf_counter() - measure_started
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Every message goes to every client in its room, the sender included
+    expected = sent * ctx.concurrency
+    return {
+        "rooms": len(keys),
+        "clients": len(tasks),
+        "client_errors": sum(isinstance(result, Exception) for result in results),
+        "messages_sent": sent,
+        "deliveries_expected": expected,
+        "deliveries_received": received,
+        "delivery_ratio": round(received / expected, 4) if expected else None,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_deliveries_per_second": round(received / elapsed, 2),
+        "latency_ms": latency_summary(latencies),
+    }
+
+def start_server(database_url: str, workers: int, port: int) -> tuple[subprocess.Popen, str]:
+    workdir = tempfile.mkdtemp(prefix="xatube-bench-")
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(BACKEND_DIR),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, "prometheus"),
+        DATABASE_URL=database_url,
+        WORKERS=str(workers),
+        BIND=f"127.0.0.1:{port}",
+        LOG_LEVEL="WARNING",
+        # SQL echo would dominate the timings
+        DEBUG="false",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(BACKEND_DIR / "gunicorn.conf.py"), "app.main:app"],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.send_signal(signal.SIGTERM)
+    server.wait(timeout=30)
+
+def wait_until_up(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+def load_dataset(args) -> dict:
+    """Seed the database, or read ids from a previous seed's dataset file"""
+    from dataclasses import asdict
+    from sqlalchemy import create_engine
+    from benchmarks.seed import seed
+
+    dataset_file = Path(args.dataset_file) if args.dataset_file else None
+    if args.no_seed:
+        if not dataset_file or not dataset_file.exists():
+            raise SystemExit("--no-seed needs --dataset-file from an earlier seeded run")
+        return json.loads(dataset_file.read_text())
+
+    engine = create_engine(args.database_url)
+    started = time.perf_counter()
+    dataset = asdict(seed(engine, args.scale, args.seed))
+    engine.dispose()
+    dataset["seed_seconds"] = round(time.perf_counter() - started, 2)
+    if dataset_file:
+        dataset_file.write_text(json.dumps(dataset))
+    return dataset
+
+async def run_scenarios(ctx: LoadContext, names: list[str], args) -> dict:
+    results = {}
+    for name in names:
+        print(f"running {name} ...", file=sys.stderr)
+        if name == "chat":
+            results[name] = await run_chat_scenario(ctx, rooms=args.chat_rooms, message_rate=args.chat_rate)
+        else:
+            results[name] = await run_http_scenario(ctx, name, password=args.password)
+    return results
+
+def main() -> int:
+    from benchmarks.seed import BENCHMARK_PASSWORD, SCALES
+
+    parser = argparse.ArgumentParser(description="API and chat load benchmark")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--dataset-file", help="where seeded ids are saved (and read with --no-seed)")
+    parser.add_argument("--base-url", help="benchmark a running server instead of starting gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users per HTTP scenario and chat room")
+    parser.add_argument("--duration", type=float, default=15, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before each scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--chat-rooms", type=int, default=3)
+    parser.add_argument("--chat-rate", type=float, default=1.0, help="messages per second per chat client")
+    parser.add_argument("--password", default=BENCHMARK_PASSWORD)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if not args.database_url and not (args.no_seed and args.base_url):
+        workdir = tempfile.mkdtemp(prefix="xatube-bench-db-")
+        args.database_url = f"sqlite:///{workdir}/bench.db"
+
+    dataset = load_dataset(args)
+
+    # Chat rooms live in one worker's memory (ConnectionManager): with several
+    # workers a room's clients miss each other's messages, and delivery_ratio
+    # would measure the worker count. Chat gets a single-worker server instead.
+    chat_workers = None if args.base_url else 1
+    separate_chat = "chat" in args.scenarios and chat_workers is not None and args.workers != chat_workers
+    names = [name for name in args.scenarios if not (separate_chat and name == "chat")]
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server, base_url = start_server(args.database_url, args.workers, args.port)
+    try:
+        wait_until_up(base_url)
+        ctx = LoadContext(base_url, dataset, args.concurrency, args.duration, args.warmup, args.seed)
+        scenarios = asyncio.run(run_scenarios(ctx, names, args))
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    if separate_chat:
+        print("chat runs on a single-worker server", file=sys.stderr)
+        server, base_url = start_server(args.database_url, chat_workers, args.port)
+        try:
+            wait_until_up(base_url)
+            ctx = LoadContext(base_url, dataset, args.concurrency, args.duration, args.warmup, args.seed)
+            scenarios.update(asyncio.run(run_scenarios(ctx, ["chat"], args)))
+        finally:
+            stop_server(server)
+
+    report = {
+        "benchmark": "xatube-api",
+        "version": 1,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_info(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "database": (args.database_url or "").split(":", 1)[0] or None,
+        },
+        "config": {
+            "scale": dataset["scale"],
+            "seed": args.seed,
+            "rows": dataset["counts"],
+            "workers": None if args.base_url else args.workers,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+            "chat_workers": chat_workers,
+            "chat_rooms": args.chat_rooms,
+            "chat_rate": args.chat_rate,
+        },
+        "scenarios": scenarios,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+        print(f"report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Deterministic data generator for benchmark databases
+
+Builds a fresh schema and fills it with users, channels, streams, views,
+comments and subscriptions. Popularity follows a Zipf-like curve so a few
+channels and streams get most of the traffic, like in production. The same
+scale and seed always produce the same rows, which keeps runs comparable.
+
+Usage:
+    python -m benchmarks.seed --database-url postgresql://... --scale small
+"""
+import argparse
+import itertools
+import random
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, create_engine, insert, text, update
+from sqlalchemy.engine import Engine
+
+from app.core.database import Base
+from app.core.security import get_password_hash
+from app.models.models import Channel, Comment, Stream, StreamView, Subscription, User
+
+BENCHMARK_PASSWORD = "benchmark-password"
+BATCH_SIZE = 5000
+EPOCH = datetime(2024, 1, 1)
+
+# users, channels, streams per channel, views, comments, subscriptions per user
+SCALES = {
+    "tiny": dict(users=50, channels=10, streams_per_channel=10, views=2_000, comments=1_000, subscriptions_per_user=5),
+    "small": dict(users=500, channels=100, streams_per_channel=20, views=50_000, comments=20_000, subscriptions_per_user=10),
+    "medium": dict(users=5_000, channels=1_000, streams_per_channel=30, views=500_000, comments=200_000, subscriptions_per_user=20),
+    "large": dict(users=50_000, channels=10_000, streams_per_channel=50, views=5_000_000, comments=2_000_000, subscriptions_per_user=30),
+}
+
+# Share of channels that are live at benchmark time
+LIVE_CHANNEL_RATIO = 0.05
+
+@dataclass
+class Dataset:
+    """Ids the load generator needs to build realistic requests"""
+    scale: str
+    counts: dict = field(default_factory=dict)
+    usernames: list[str] = field(default_factory=list)
+    channel_ids: list[int] = field(default_factory=list)
+    live_stream_keys: list[str] = field(default_factory=list)
+    stream_ids: list[int] = field(default_factory=list)
+    commented_stream_ids: list[int] = field(default_factory=list)
+
+def zipf_weights(n: int, s: float = 1.1) -> list[float]:
+    return [1 / (rank + 1) ** s for rank in range(n)]
+
+def _insert(engine: Engine, model, rows) -> int:
+    """Insert an iterable of row dicts in batches, returns the row count"""
+    total = 0
+    rows = iter(rows)
+    with engine.begin() as conn:
+        while batch := list(itertools.islice(rows, BATCH_SIZE)):
+            conn.execute(insert(model), batch)
+            total += len(batch)
+    return total
+
+def _reset_sequences(engine: Engine) -> None:
+    """Explicit ids leave Postgres sequences at 1; move them past the data"""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if "id" not in table.c:
+                continue
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+            ))
+
+def seed(engine: Engine, scale: str = "small", rng_seed: int = 42) -> Dataset:
+    """Drop and recreate all tables, then fill them for the given scale"""
+    volumes = SCALES[scale]
+    rng = random.Random(rng_seed)
+    dataset = Dataset(scale=scale)
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    # One real hash shared by everyone keeps seeding fast while login still works
+    hashed_password = get_password_hash(BENCHMARK_PASSWORD)
+
+    n_users = volumes["users"]
+    dataset.usernames = [f"bench_user_{i}" for i in range(1, n_users + 1)]
+    dataset.counts["users"] = _insert(engine, User, (
+        dict(
+            id=i,
+            username=name,
+            email=f"{name}@bench.xatube.com",
+            hashed_password=hashed_password,
+            full_name=f"Bench User {i}",
+            is_active=True,
+            created_at=EPOCH + timedelta(minutes=i),
+            updated_at=EPOCH + timedelta(minutes=i),
+        )
+        for i, name in enumerate(dataset.usernames, start=1)
+    ))
+
+    # Channel owners are the first users; channel 1 is the most popular
+    n_channels = volumes["channels"]
+    dataset.channel_ids = list(range(1, n_channels + 1))
+    live_channels = set(rng.sample(dataset.channel_ids, max(1, int(n_channels * LIVE_CHANNEL_RATIO))))
+    dataset.counts["channels"] = _insert(engine, Channel, (
+        dict(
+            id=channel_id,
+            user_id=channel_id,
+            title=f"Bench channel {channel_id}",
+            description="Benchmark channel",
+            stream_key=f"bench-key-{channel_id}",
+            is_live=channel_id in live_channels,
+            viewers_count=rng.randint(1, 500) if channel_id in live_channels else 0,
+            created_at=EPOCH + timedelta(hours=channel_id),
+            updated_at=EPOCH + timedelta(hours=channel_id),
+        )
+        for channel_id in dataset.channel_ids
+    ))
+    dataset.live_stream_keys = sorted(f"bench-key-{channel_id}" for channel_id in live_channels)
+
+    # Past broadcasts spread over a year, plus one live stream per live channel
+    stream_rows = []
+    for channel_id in dataset.channel_ids:
+        for n in range(volumes["streams_per_channel"]):
+            started_at = EPOCH + timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+            is_live = channel_id in live_channels and n == 0
+            duration = rng.randint(600, 4 * 3600)
+            stream_rows.append(dict(
+                channel_id=channel_id,
+                title=f"Bench stream {channel_id}/{n}",
+                description="Benchmark stream",
+                video_url=None if is_live else f"/uploads/videos/bench_{channel_id}_{n}.mp4",
+                duration=0 if is_live else duration,
+                started_at=started_at,
+                ended_at=None if is_live else started_at + timedelta(seconds=duration),
+                is_live=is_live,
+                is_archived=not is_live,
+                view_count=0,
+                created_at=started_at,
+                updated_at=started_at,
+            ))
+    stream_rows.sort(key=lambda row: row["created_at"])
+    for stream_id, row in enumerate(stream_rows, start=1):
+        row["id"] = stream_id
+    dataset.stream_ids = [row["id"] for row in stream_rows]
+
+    # Popularity is independent of age: shuffle ids before weighting them
+    popular_streams = dataset.stream_ids[:]
+    rng.shuffle(popular_streams)
+    stream_weights = zipf_weights(len(popular_streams))
+
+    view_stream_ids = rng.choices(popular_streams, weights=stream_weights, k=volumes["views"])
+    view_counts: dict[int, int] = {}
+    for stream_id in view_stream_ids:
+        view_counts[stream_id] = view_counts.get(stream_id, 0) + 1
+    for row in stream_rows:
+        row["view_count"] = view_counts.get(row["id"], 0)
+    dataset.counts["streams"] = _insert(engine, Stream, stream_rows)
+
+    created_by_id = {row["id"]: row["created_at"] for row in stream_rows}
+    dataset.counts["stream_views"] = _insert(engine, StreamView, (
+        dict(
+            stream_id=stream_id,
+            user_id=rng.randint(1, n_users) if rng.random() < 0.6 else None,
+            session_id=f"bench-session-{i}",
+            watch_duration=rng.randint(5, 3600),
+            started_at=created_by_id[stream_id] + timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+        )
+        for i, stream_id in enumerate(view_stream_ids)
+    ))
+
+    comment_stream_ids = rng.choices(popular_streams, weights=stream_weights, k=volumes["comments"])
+    dataset.counts["comments"] = _insert(engine, Comment, (
+        dict(
+            stream_id=stream_id,
+            user_id=rng.randint(1, n_users),
+            text=f"Benchmark comment {i}",
+            created_at=created_by_id[stream_id] + timedelta(seconds=i),
+            updated_at=created_by_id[stream_id] + timedelta(seconds=i),
+        )
+        for i, stream_id in enumerate(comment_stream_ids)
+    ))
+    # Most commented first, so the load generator hits hot threads hardest
+    comment_counts: dict[int, int] = {}
+    for stream_id in comment_stream_ids:
+        comment_counts[stream_id] = comment_counts.get(stream_id, 0) + 1
+    dataset.commented_stream_ids = sorted(comment_counts, key=comment_counts.get, reverse=True)
+    with engine.begin() as conn:
+        conn.execute(
+            update(Stream).where(Stream.id == bindparam("stream_id")).values(comment_count=bindparam("count")),
+            [dict(stream_id=stream_id, count=count) for stream_id, count in comment_counts.items()],
+        )
+
+    # Popular channels collect most subscribers; pairs are unique
+    channel_weights = zipf_weights(n_channels)
+    per_user = min(volumes["subscriptions_per_user"], n_channels)
+    subscription_rows = []
+    for user_id in range(1, n_users + 1):
+        channels = set()
+        while len(channels) < per_user:
+            channels.update(rng.choices(dataset.channel_ids, weights=channel_weights, k=per_user - len(channels)))
+        subscription_rows.extend(
+            dict(subscriber_id=user_id, channel_id=channel_id, created_at=EPOCH + timedelta(days=channel_id % 365))
+            for channel_id in sorted(channels)
+        )
+    dataset.counts["subscriptions"] = _insert(engine, Subscription, subscription_rows)
+
+    if engine.dialect.name == "postgresql":
+        _reset_sequences(engine)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+
+    return dataset
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Seed a benchmark database")
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    dataset = seed(engine, args.scale, args.seed)
+    engine.dispose()
+    for table, count in dataset.counts.items():
+        print(f"{table:<15} {count}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Gunicorn settings for running the API with several uvicorn workers
+
+Prometheus metrics are collected in multiprocess mode: every worker writes
+its samples to PROMETHEUS_MULTIPROC_DIR and /metrics aggregates the files,
+so a scrape sees totals for the whole container rather than one worker.
+"""
+import os
+import shutil
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WORKERS", os.getenv("WEB_CONCURRENCY", "2")))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+accesslog = "-"
+# Import the app once in the master; workers fork from it and boot in milliseconds
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+
+# The preloaded app creates its metric files before on_starting runs
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+def on_starting(server):
+    """Start from an empty metrics directory so samples of a previous run are not summed in"""
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    """Drop live gauges of a dead worker; its counters and histograms are kept"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+def post_fork(server, worker):
+    """Workers must not share pooled connections opened in the master"""
+    if preload_app:
+        from app.core.database import dispose_engines_after_fork
+        dispose_engines_after_fork()
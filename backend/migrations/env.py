@@ -0,0 +1,51 @@
+"""Alembic environment: runs revisions against settings.database_url"""
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from app.core.config import settings
+from app.core.database import Base
+import app.models.models  # noqa: F401  registers the tables on Base.metadata
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline() -> None:
+    """Emit the SQL instead of running it (alembic upgrade head --sql)"""
+    context.configure(
+        url=settings.database_url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    connectable = create_engine(settings.database_url, poolclass=NullPool)
+
+    with connectable.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # Session-wide: DDL waiting longer than this for its lock fails
+            # instead of blocking every query queued behind it
+            connection.exec_driver_sql(f"SET lock_timeout = {settings.migration_lock_timeout_ms}")
+            connection.commit()
+
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+    connectable.dispose()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
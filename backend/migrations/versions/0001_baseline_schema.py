@@ -0,0 +1,175 @@
+"""baseline schema
+
+Tables, keys and the single-column indexes, as the first create_all
+built them. Databases created before migrations were tracked are
+stamped at this revision by app.core.init_db.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 12:39:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=False),
+        sa.Column('full_name', sa.String(length=100), nullable=True),
+        sa.Column('avatar_url', sa.String(length=500), nullable=True),
+        sa.Column('bio', sa.Text(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'documents',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('slug', sa.String(length=50), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_documents_id', 'documents', ['id'])
+    op.create_index('ix_documents_slug', 'documents', ['slug'], unique=True)
+
+    op.create_table(
+        'channels',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('thumbnail_url', sa.String(length=500), nullable=True),
+        sa.Column('stream_key', sa.String(length=255), nullable=False),
+        sa.Column('is_live', sa.Boolean(), nullable=True),
+        sa.Column('viewers_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('stream_key'),
+    )
+    op.create_index('ix_channels_id', 'channels', ['id'])
+    op.create_index('ix_channels_is_live', 'channels', ['is_live'])
+
+    op.create_table(
+        'streams',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('channel_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('thumbnail_url', sa.String(length=500), nullable=True),
+        sa.Column('video_url', sa.String(length=500), nullable=True),
+        sa.Column('cover_image_url', sa.String(length=500), nullable=True),
+        sa.Column('duration', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('ended_at', sa.DateTime(), nullable=True),
+        sa.Column('is_live', sa.Boolean(), nullable=True),
+        sa.Column('is_archived', sa.Boolean(), nullable=True),
+        sa.Column('view_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_streams_id', 'streams', ['id'])
+    op.create_index('ix_streams_is_live', 'streams', ['is_live'])
+
+    op.create_table(
+        'stream_views',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('stream_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('session_id', sa.String(length=255), nullable=True),
+        sa.Column('watch_duration', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('ended_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['stream_id'], ['streams.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_stream_views_id', 'stream_views', ['id'])
+
+    op.create_table(
+        'statistics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('channel_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.String(length=10), nullable=False),
+        sa.Column('total_views', sa.Integer(), nullable=True),
+        sa.Column('unique_viewers', sa.Integer(), nullable=True),
+        sa.Column('avg_watch_time', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_statistics_id', 'statistics', ['id'])
+
+    op.create_table(
+        'subscriptions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('subscriber_id', sa.Integer(), nullable=False),
+        sa.Column('channel_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['subscriber_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_subscriptions_id', 'subscriptions', ['id'])
+
+    op.create_table(
+        'schedules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('channel_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('scheduled_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_schedules_id', 'schedules', ['id'])
+
+    op.create_table(
+        'comments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('stream_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['stream_id'], ['streams.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_comments_id', 'comments', ['id'])
+
+
+def downgrade() -> None:
+    for table in (
+        'comments', 'schedules', 'subscriptions', 'statistics',
+        'stream_views', 'streams', 'channels', 'documents', 'users',
+    ):
+        op.drop_table(table)
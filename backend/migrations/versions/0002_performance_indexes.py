@@ -0,0 +1,66 @@
+"""performance indexes
+
+Keyset pagination and hot-filter indexes, previously raw SQL files 004
+and 005. Built with CREATE INDEX CONCURRENTLY, so streams, stream_views
+and subscriptions keep taking writes while they build; IF NOT EXISTS
+makes this a no-op on databases where create_all already made them.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 12:45:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.core.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    # Keyset pagination: listings ordered by (created_at, id)
+    ('ix_streams_is_live_created_at_id', 'streams', ['is_live', 'created_at', 'id']),
+    ('ix_streams_channel_id_created_at_id', 'streams', ['channel_id', 'created_at', 'id']),
+    ('ix_comments_stream_id_created_at_id', 'comments', ['stream_id', 'created_at', 'id']),
+    ('ix_channels_created_at_id', 'channels', ['created_at', 'id']),
+    # Channel page filters, view aggregation, subscriber counts, schedules
+    ('ix_streams_channel_id_is_live_created_at', 'streams', ['channel_id', 'is_live', 'created_at']),
+    ('ix_streams_channel_id_is_archived_created_at', 'streams', ['channel_id', 'is_archived', 'created_at']),
+    ('ix_channels_user_id', 'channels', ['user_id']),
+    ('ix_stream_views_stream_id', 'stream_views', ['stream_id']),
+    ('ix_subscriptions_channel_id', 'subscriptions', ['channel_id']),
+    ('ix_schedules_channel_id_scheduled_at', 'schedules', ['channel_id', 'scheduled_at']),
+)
+
+UNIQUE_INDEXES = (
+    ('uq_subscriptions_subscriber_id_channel_id', 'subscriptions', ['subscriber_id', 'channel_id']),
+    ('uq_statistics_channel_id_date', 'statistics', ['channel_id', 'date']),
+)
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        create_index_concurrently(name, table, columns)
+
+    # Drop duplicates left by concurrent requests before enforcing uniqueness
+    op.execute(
+        "DELETE FROM subscriptions WHERE id NOT IN "
+        "(SELECT MIN(id) FROM subscriptions GROUP BY subscriber_id, channel_id)"
+    )
+    op.execute(
+        "DELETE FROM statistics WHERE id NOT IN "
+        "(SELECT MIN(id) FROM statistics GROUP BY channel_id, date)"
+    )
+    for name, table, columns in UNIQUE_INDEXES:
+        create_index_concurrently(name, table, columns, unique=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in UNIQUE_INDEXES + INDEXES:
+        drop_index_concurrently(name, table)
@@ -0,0 +1,67 @@
+"""comment counters and threads
+
+Adds streams.comment_count, comments.parent_id and comments.reply_count.
+The counter columns get a constant default, which Postgres stores in the
+catalog without rewriting the table. The parent foreign key is added NOT
+VALID and validated in a transaction of its own, and the counts are backfilled in batches,
+so streams and comments stay writable throughout.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 13:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import (
+    backfill_in_batches, create_index_concurrently, drop_index_concurrently, validate_constraint
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('streams', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('comments', sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+
+    if op.get_context().dialect.name == 'postgresql':
+        op.add_column('comments', sa.Column('parent_id', sa.Integer(), nullable=True))
+        op.execute(
+            'ALTER TABLE comments ADD CONSTRAINT fk_comments_parent_id_comments '
+            'FOREIGN KEY (parent_id) REFERENCES comments (id) ON DELETE CASCADE NOT VALID'
+        )
+        # Committed first, then scans the table without blocking writes
+        validate_constraint('comments', 'fk_comments_parent_id_comments')
+    else:
+        with op.batch_alter_table('comments') as batch_op:
+            batch_op.add_column(sa.Column('parent_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(
+                'fk_comments_parent_id_comments', 'comments', ['parent_id'], ['id'], ondelete='CASCADE'
+            )
+
+    create_index_concurrently('ix_comments_parent_id_created_at_id', 'comments', ['parent_id', 'created_at', 'id'])
+
+    # Existing comments are all top-level, so only the stream totals need
+    # filling; streams without comments keep the default and are not rewritten
+    backfill_in_batches(
+        'streams',
+        'comment_count = (SELECT COUNT(*) FROM comments WHERE comments.stream_id = streams.id)',
+        'EXISTS (SELECT 1 FROM comments WHERE comments.stream_id = streams.id)',
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_comments_parent_id_created_at_id', 'comments')
+    with op.batch_alter_table('comments') as batch_op:
+        batch_op.drop_constraint('fk_comments_parent_id_comments', type_='foreignkey')
+        batch_op.drop_column('parent_id')
+        batch_op.drop_column('reply_count')
+    op.drop_column('streams', 'comment_count')
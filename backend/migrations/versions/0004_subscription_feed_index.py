@@ -0,0 +1,30 @@
+"""subscription feed index
+
+Keyset pagination of /api/subscriptions/feed: a user's subscriptions
+ordered by (created_at, id).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:05:00
+
+"""
+from typing import Sequence, Union
+
+from app.core.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    create_index_concurrently(
+        'ix_subscriptions_subscriber_id_created_at_id', 'subscriptions', ['subscriber_id', 'created_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_subscriptions_subscriber_id_created_at_id', 'subscriptions')
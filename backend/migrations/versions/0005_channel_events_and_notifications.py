@@ -0,0 +1,77 @@
+"""channel events and notifications
+
+Adds the channel_events queue and the notifications inbox. The followers
+index on subscriptions becomes (channel_id, id) so the fan-out worker
+pages through a channel's followers in id order; it still serves
+per-channel counts.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 15:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'channel_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('channel_id', sa.Integer(), nullable=False),
+        sa.Column('stream_id', sa.Integer(), nullable=True),
+        sa.Column('schedule_id', sa.Integer(), nullable=True),
+        sa.Column('event_type', sa.String(length=32), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=True),
+        sa.Column('fanout', sa.String(length=8), nullable=True),
+        sa.Column('fanout_cursor', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('fanned_out_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['stream_id'], ['streams.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['schedule_id'], ['schedules.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_channel_events_id', 'channel_events', ['id'])
+    op.create_index('ix_channel_events_channel_id_created_at_id', 'channel_events', ['channel_id', 'created_at', 'id'])
+    op.create_index(
+        'ix_channel_events_pending', 'channel_events', ['id'],
+        postgresql_where=sa.text('fanned_out_at IS NULL'),
+        sqlite_where=sa.text('fanned_out_at IS NULL'),
+    )
+
+    op.create_table(
+        'notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['event_id'], ['channel_events.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_notifications_user_id_created_at_event_id', 'notifications', ['user_id', 'created_at', 'event_id']
+    )
+    op.create_index('uq_notifications_event_id_user_id', 'notifications', ['event_id', 'user_id'], unique=True)
+
+    create_index_concurrently('ix_subscriptions_channel_id_id', 'subscriptions', ['channel_id', 'id'])
+    drop_index_concurrently('ix_subscriptions_channel_id', 'subscriptions')
+
+
+def downgrade() -> None:
+    create_index_concurrently('ix_subscriptions_channel_id', 'subscriptions', ['channel_id'])
+    drop_index_concurrently('ix_subscriptions_channel_id_id', 'subscriptions')
+    op.drop_table('notifications')
+    op.drop_table('channel_events')
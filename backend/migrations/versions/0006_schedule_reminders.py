@@ -0,0 +1,50 @@
+"""schedule reminders
+
+Adds schedules.notified_at and a partial index on scheduled_at over the
+schedules whose reminder is not sent yet - the scheduler's only read.
+Existing schedules that already started are marked notified, so the
+first scheduler run does not remind about them.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 16:20:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import backfill_in_batches, create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('schedules', sa.Column('notified_at', sa.DateTime(), nullable=True))
+
+    # scheduled_at is naive UTC; CURRENT_TIMESTAMP would follow the session time zone
+    now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    backfill_in_batches(
+        'schedules',
+        'notified_at = scheduled_at',
+        f"notified_at IS NULL AND scheduled_at < '{now}'",
+    )
+
+    create_index_concurrently(
+        'ix_schedules_pending_scheduled_at', 'schedules', ['scheduled_at'],
+        postgresql_where=sa.text('notified_at IS NULL'),
+        sqlite_where=sa.text('notified_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_schedules_pending_scheduled_at', 'schedules')
+    with op.batch_alter_table('schedules') as batch_op:
+        batch_op.drop_column('notified_at')
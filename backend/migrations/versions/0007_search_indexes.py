@@ -0,0 +1,53 @@
+"""search indexes
+
+Full-text GIN indexes for /api/search over streams, channels and users,
+and text_pattern_ops indexes on lower(title) / lower(username) for the
+prefix match of /api/search/suggest.
+
+The GIN indexes are on expressions, not on stored tsvector columns:
+adding columns would rewrite the tables. The expressions are the ones
+search_document() in app/models/models.py builds. Postgres only; SQLite
+searches with LIKE.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 18:40:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_streams_search', 'streams', "to_tsvector('simple'::regconfig, coalesce(title, '') || ' ' || coalesce(description, ''))", 'gin'),
+    ('ix_channels_search', 'channels', "to_tsvector('simple'::regconfig, coalesce(title, '') || ' ' || coalesce(description, ''))", 'gin'),
+    ('ix_users_search', 'users', "to_tsvector('simple'::regconfig, coalesce(username, '') || ' ' || coalesce(full_name, ''))", 'gin'),
+    ('ix_channels_title_prefix', 'channels', 'lower(title) text_pattern_ops', 'btree'),
+    ('ix_users_username_prefix', 'users', 'lower(username) text_pattern_ops', 'btree'),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name, table, expression, using in INDEXES:
+        create_index_concurrently(name, table, [sa.text(expression)], postgresql_using=using)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name, table, _, _ in INDEXES:
+        drop_index_concurrently(name, table)
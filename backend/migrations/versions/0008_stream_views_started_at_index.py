@@ -0,0 +1,31 @@
+"""stream views by time
+
+Trending (app/services/trending.py): a new scheduler leader counts the
+views per stream of the last few half-lives, range by range on
+started_at.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 21:10:00
+
+"""
+from typing import Sequence, Union
+
+from app.core.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    create_index_concurrently(
+        'ix_stream_views_started_at_stream_id', 'stream_views', ['started_at', 'stream_id']
+    )
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_stream_views_started_at_stream_id', 'stream_views')
@@ -10,11 +10,11 @@ DB_HOST="${DB_HOST:-db}"
 DB_PORT="${DB_PORT:-5432}"
 DB_NAME="${DB_NAME:-xatube}"
 
-CONNECTION_STRING="postgresql://${DB_USER}:${DB_PASSWORD}@${DB_HOST}:${DB_PORT}/${DB_NAME}"
+export DATABASE_URL="${DATABASE_URL:-postgresql://${DB_USER}:${DB_PASSWORD}@${DB_HOST}:${DB_PORT}/${DB_NAME}}"
 
-# Run migrations
-psql "$CONNECTION_STRING" -f /app/migrations/001_initial_schema.sql || true
-psql "$CONNECTION_STRING" -f /app/migrations/002_add_video_url_to_streams.sql || true
-psql "$CONNECTION_STRING" -f /app/migrations/003_add_comments_table.sql || true
+# Waits for the database, stamps a pre-Alembic schema at the baseline,
+# then runs `alembic upgrade head`
+cd "$(dirname "$0")"
+python -m app.core.init_db
 
 echo "Migrations completed successfully"
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Multi-worker metrics check
+
+Starts the API under gunicorn with N uvicorn workers, sends a known number
+of requests, and verifies that every /metrics scrape reports the full
+total no matter which worker answers it - also after a worker is killed
+and replaced by gunicorn.
+
+Usage:
+    python scripts/check_multiprocess_metrics.py [--workers 4] [--requests 200]
+"""
+import argparse
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+HEALTH_SAMPLE = re.compile(r'^api_requests_total\{endpoint="/health",method="GET",status="200"\} (\S+)$', re.M)
+
+def worker_pids(master_pid: int) -> list[int]:
+    """Children of the gunicorn master (Linux /proc)"""
+    pids = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # Field 4 is the parent pid; the command name may contain spaces
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        if ppid == master_pid:
+            pids.append(int(entry.name))
+    return pids
+
+def wait_until_up(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+def scraped_totals(base_url: str, scrapes: int) -> list[float]:
+    totals = []
+    for _ in range(scrapes):
+        # A fresh connection per scrape lets different workers answer
+        match = HEALTH_SAMPLE.search(httpx.get(f"{base_url}/metrics").text)
+        totals.append(float(match.group(1)) if match else 0.0)
+    return totals
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    workdir = tempfile.mkdtemp(prefix="xatube-metrics-")
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(BACKEND_DIR),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, "prometheus"),
+        DATABASE_URL=os.environ.get("DATABASE_URL", f"sqlite:///{workdir}/metrics.db"),
+        WORKERS=str(args.workers),
+        BIND=f"127.0.0.1:{args.port}",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(BACKEND_DIR / "gunicorn.conf.py"), "app.main:app"],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        wait_until_up(base_url)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(lambda _: httpx.get(f"{base_url}/health"), range(args.requests)))
+
+        failures = 0
+        totals = scraped_totals(base_url, scrapes=args.workers * 3)
+        if any(total != args.requests for total in totals):
+            failures += 1
+            print(f"FAIL scrapes disagree with {args.requests} requests: {totals}")
+        else:
+            print(f"ok   {len(totals)} scrapes across {args.workers} workers report {args.requests}")
+
+        # Kill one worker; gunicorn replaces it and its samples must survive
+        victim = worker_pids(server.pid)[0]
+        os.kill(victim, signal.SIGKILL)
+        time.sleep(2)
+        wait_until_up(base_url)
+
+        totals = scraped_totals(base_url, scrapes=args.workers * 3)
+        if any(total != args.requests for total in totals):
+            failures += 1
+            print(f"FAIL totals changed after worker {victim} died: {totals}")
+        else:
+            print(f"ok   totals intact after worker {victim} died")
+
+        return 1 if failures else 0
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+if __name__ == "__main__":
+    sys.exit(main())
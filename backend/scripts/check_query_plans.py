@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Query plan audit for hot routes
+
+Runs EXPLAIN on the SQL issued by the hot listing/lookup routes and fails
+if any of them needs a sequential scan. Sequential scans are disabled for
+the session, so the planner only falls back to one when no usable index
+exists - which is exactly what this check is meant to catch.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/check_query_plans.py [--create-schema]
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+from app.core.database import Base, engine
+from app.models.models import Channel, Comment, Schedule, Statistic, Stream, StreamView, Subscription, User
+from app.services.search import SEARCH_CHANNELS, SEARCH_STREAMS, SEARCH_USERS, search_query
+
+NOW = datetime(2025, 1, 1)
+
+def hot_queries(db: Session) -> dict:
+    """SQL of the hot routes, built the same way the routes build it"""
+    return {
+        "streams.get_streams": db.query(Stream).join(Channel).join(User).filter(
+            Stream.is_live == True
+        ).order_by(Stream.created_at.desc(), Stream.id.desc()).limit(21),
+        "streams.get_streams (cursor)": db.query(Stream).join(Channel).join(User).filter(
+            Stream.is_live == True,
+            tuple_(Stream.created_at, Stream.id) < tuple_(NOW, 1000)
+        ).order_by(Stream.created_at.desc(), Stream.id.desc()).limit(21),
+        "streams.get_streams (channel)": db.query(Stream).filter(
+            Stream.channel_id == 1,
+            Stream.is_live == True
+        ).order_by(Stream.created_at.desc(), Stream.id.desc()).limit(21),
+        "streams.get_all_channel_streams": db.query(Stream).filter(
+            Stream.channel_id == 1
+        ).order_by(Stream.created_at.desc(), Stream.id.desc()).limit(21),
+        "streams.get_user_videos": db.query(Stream).filter(
+            Stream.channel_id.in_([1, 2]),
+            Stream.is_archived == True
+        ).order_by(Stream.created_at.desc(), Stream.id.desc()).limit(21),
+        "streams.get_stream_by_key": db.query(Channel).filter(Channel.stream_key == "key"),
+        "streams.get_stream_by_key (live stream)": db.query(Stream).filter(
+            Stream.channel_id == 1,
+            Stream.is_live == True
+        ).order_by(Stream.created_at.desc()).limit(1),
+        "channels.get_channels": db.query(Channel).filter(
+            Channel.user_id == 1
+        ).order_by(Channel.created_at.desc(), Channel.id.desc()).limit(21),
+        "comments.get_comments": db.query(Comment).filter(
+            Comment.stream_id == 1
+        ).order_by(Comment.created_at.desc(), Comment.id.desc()).limit(101),
+        "subscriptions.is_subscribed": db.query(Subscription).filter(
+            Subscription.subscriber_id == 1,
+            Subscription.channel_id == 1
+        ).limit(1),
+        "subscriptions.subscribers_count": db.query(func.count(Subscription.id)).filter(
+            Subscription.channel_id == 1
+        ),
+        "statistics.unique_viewers": db.query(func.count(func.distinct(StreamView.user_id))).join(
+            Stream
+        ).filter(Stream.channel_id == 1),
+        "statistics.get_channel_daily_stats": db.query(Statistic).filter(
+            Statistic.channel_id == 1,
+            Statistic.date >= "2025-01-01"
+        ).order_by(Statistic.date),
+        "schedules.get_channel_schedules": db.query(Schedule).filter(
+            Schedule.channel_id == 1
+        ).order_by(Schedule.scheduled_at),
+        "schedules.get_upcoming_schedules": db.query(Schedule).filter(
+            Schedule.channel_id.in_([1, 2]),
+            Schedule.scheduled_at > NOW
+        ).order_by(Schedule.scheduled_at),
+        "trending.bootstrap": db.query(StreamView.stream_id, func.count(StreamView.id)).filter(
+            StreamView.started_at >= NOW,
+            StreamView.started_at < NOW + timedelta(hours=1)
+        ).group_by(StreamView.stream_id),
+        "trending.get_trending_streams (fallback)": db.query(Stream).join(Channel).filter(
+            Stream.is_live == True
+        ).order_by(Channel.viewers_count.desc(), Stream.created_at.desc(), Stream.id.desc()).limit(20),
+        "search.search_streams": search_query(db, SEARCH_STREAMS, ["mine", "craft"])[0].limit(21),
+        "search.search_channels": search_query(db, SEARCH_CHANNELS, ["mine"])[0].limit(21),
+        "search.search_users": search_query(db, SEARCH_USERS, ["mine"])[0].limit(21),
+        "search.suggest (channels)": db.query(Channel.id, Channel.title).filter(
+            func.lower(Channel.title).like("mine%")
+        ).order_by(Channel.is_live.desc(), Channel.viewers_count.desc(), Channel.id).limit(10),
+        "search.suggest (users)": db.query(User.id, User.username).filter(
+            func.lower(User.username).like("mine%"),
+            User.is_active == True
+        ).order_by(func.length(User.username), User.id).limit(10),
+    }
+
+def find_seq_scans(plan: dict) -> list[str]:
+    """Return the relations read by Seq Scan nodes anywhere in the plan tree"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        found.extend(find_seq_scans(child))
+    return found
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--create-schema", action="store_true", help="create missing tables before auditing")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print(f"Query plan audit needs PostgreSQL, got {engine.dialect.name}")
+        return 2
+
+    if args.create_schema:
+        Base.metadata.create_all(bind=engine)
+
+    failures = 0
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        db = Session(bind=connection)
+
+        for name, query in hot_queries(db).items():
+            compiled = query.statement.compile(
+                dialect=engine.dialect,
+                compile_kwargs={"render_postcompile": True}
+            )
+            rows = connection.exec_driver_sql(
+                "EXPLAIN (FORMAT JSON) " + str(compiled),
+                compiled.params
+            ).scalar()
+            seq_scans = find_seq_scans(rows[0]["Plan"])
+
+            if seq_scans:
+                failures += 1
+                print(f"FAIL {name}: sequential scan on {', '.join(seq_scans)}")
+            else:
+                print(f"ok   {name}")
+
+        db.close()
+
+    if failures:
+        print(f"{failures} hot queries need an index")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())